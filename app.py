@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from pattern_detector import detect_patterns, get_pattern_description
+from pattern_detector import PATTERN_ACTIONS, data_fingerprint, detect_patterns, get_pattern_description
 from backtester import backtest_patterns
+from streaming_detector import StreamingPatternDetector
 from data_fetcher import fetch_alpha_vantage_data
+from bar_cache import BarCache
+from indicators import IncrementalIndicators, compute_indicators
+from chart_rendering import (DOWNSAMPLE_METHODS, buckets_for_width, downsample_line, downsample_ohlc,
+                             pattern_points, vline_annotations, vline_shapes)
+import instrumentation
 import time
 import numpy as np
 import logging
@@ -34,6 +40,38 @@ ticker = custom_ticker if custom_ticker else ticker
 # Alpha Vantage API key (hardcoded for testing)
 ALPHA_VANTAGE_KEY = "P1HAF0HQIWQJLUHM"
 
+# Persistent on-disk bar cache shared across reruns
+BAR_CACHE = BarCache(".cache/bars")
+
+# Seconds a fetched series is reused across reruns, aligned to the bar interval
+FETCH_TTLS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 3600}
+
+# Each stage is cached on its own inputs, so a widget change only recomputes the
+# stages that depend on it. Arguments starting with "_" are not hashed by
+# Streamlit; the data fingerprint stands in for the DataFrame instead.
+class FetchError(Exception):
+    """Raised by load_data so failed fetches are retried on the next rerun instead of cached."""
+
+@st.cache_data(ttl=max(FETCH_TTLS.values()), show_spinner=False)
+def load_data(ticker, period, interval, time_bucket):
+    # time_bucket changes once per interval TTL, which expires the entry on bar boundaries
+    data, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=ALPHA_VANTAGE_KEY, cache=BAR_CACHE)
+    if error:
+        raise FetchError(error)
+    return data
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_patterns(_data, fingerprint, sensitivity):
+    return detect_patterns(_data, sensitivity)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_backtest(_data, fingerprint, sensitivity, look_forward):
+    return backtest_patterns(_data, PATTERN_ACTIONS, look_forward, sensitivity=sensitivity)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_indicators(_data, fingerprint):
+    return compute_indicators(_data['Close'].to_numpy(), sma_period=20, ema_period=20, rsi_period=14)
+
 # Restrict intervals based on period
 period = st.sidebar.selectbox("Data Period", ["1d", "5d", "1mo", "3mo", "6mo"], index=1, key="period_select")
 if period in ["1d", "5d"]:
@@ -52,13 +90,17 @@ show_sma = st.sidebar.checkbox("Show Simple Moving Average (SMA)", value=True)
 show_ema = st.sidebar.checkbox("Show Exponential Moving Average (EMA)", value=False)
 show_rsi = st.sidebar.checkbox("Show Relative Strength Index (RSI)", value=False)
 
-# Custom RSI calculation
-def calculate_rsi(data, periods=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
+# Chart rendering: long histories are bucketed to roughly the chart's pixel width
+downsample_charts = st.sidebar.checkbox("Downsample Long Charts", value=True, help="Keeps every bar a detected pattern uses")
+chart_width = st.sidebar.slider("Chart Width (px)", 600, 3840, 1600, 100, help="Bars are bucketed to about one candle per two pixels")
+downsample_method = DOWNSAMPLE_METHODS[st.sidebar.selectbox("Line Downsampling", list(DOWNSAMPLE_METHODS))]
+
+# Stage timings and cache hit rates. Collection is process-wide and shared by
+# all sessions: this option only turns it on (never off) and shows the totals.
+# Set PATTERN_METRICS=1 to collect from startup.
+show_metrics = st.sidebar.checkbox("Show Performance Metrics", value=False)
+if show_metrics and not instrumentation.is_enabled():
+    instrumentation.enable()
 
 # Tabs for different functionalities
 tab1, tab2, tab3 = st.tabs(["Live Data & Patterns", "Backtesting", "Technical Indicators"])
@@ -68,7 +110,10 @@ with tab1:
     if ticker:
         # Fetch data
         st.write(f"Running fetch_data({ticker}, {period}, {interval}) using Alpha Vantage...")
-        data, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=ALPHA_VANTAGE_KEY)
+        try:
+            data, error = load_data(ticker, period, interval, int(time.time() // FETCH_TTLS[interval])), None
+        except FetchError as e:
+            data, error = pd.DataFrame(), str(e)
         if error:
             st.error(error)
         elif data.empty:
@@ -77,36 +122,39 @@ with tab1:
             st.dataframe(data.tail())
 
             # Detect patterns
-            patterns = detect_patterns(data, sensitivity)
+            fingerprint = data_fingerprint(data['Close'].to_numpy())
+            patterns = cached_patterns(data, fingerprint, sensitivity)
             
             # Plot chart with patterns
+            figure_start = time.perf_counter()
+            # Pattern bars stay exact; everything else is bucketed when the chart has more bars than pixels
+            keep = pattern_points(patterns)
+            n_buckets = buckets_for_width(chart_width) if downsample_charts else len(data)
+            n_line_points = 2 * n_buckets
+            candles = downsample_ohlc(data, n_buckets, keep)
             fig = go.Figure()
             fig.add_trace(go.Candlestick(
-                x=data.index,
-                open=data['Open'],
-                high=data['High'],
-                low=data['Low'],
-                close=data['Close'],
+                x=candles.index,
+                open=candles['Open'],
+                high=candles['High'],
+                low=candles['Low'],
+                close=candles['Close'],
                 name="OHLC"
             ))
             
-            # Add technical indicators
-            if show_sma:
-                data['SMA'] = data['Close'].rolling(window=20).mean()
-                fig.add_trace(go.Scatter(x=data.index, y=data['SMA'], name="SMA", line=dict(color="blue")))
-            if show_ema:
-                data['EMA'] = data['Close'].ewm(span=20, adjust=False).mean()
-                fig.add_trace(go.Scatter(x=data.index, y=data['EMA'], name="EMA", line=dict(color="purple")))
-            if show_rsi:
-                data['RSI'] = calculate_rsi(data['Close'], periods=14)
-                fig.add_trace(go.Scatter(x=data.index, y=data['RSI'], name="RSI", line=dict(color="green"), yaxis="y2"))
-
-            # Add pattern annotations
+            # Add technical indicators (computed in one pass, kept out of the OHLC frame)
+            indicator_values = cached_indicators(data, fingerprint)
+            for name, color, show in [("SMA", "blue", show_sma), ("EMA", "purple", show_ema), ("RSI", "green", show_rsi)]:
+                if show:
+                    x, y = downsample_line(data.index, indicator_values[name], n_line_points, keep, downsample_method)
+                    fig.add_trace(go.Scattergl(x=x, y=y, name=name, line=dict(color=color), yaxis="y2" if name == "RSI" else "y"))
+
+            # Add pattern annotations (all markers go into one shapes list)
             detected_patterns = []
+            pattern_lines = []
             for pattern, info in patterns.items():
                 if info['detected']:
-                    for idx in info['points']:
-                        fig.add_vline(x=data.index[idx], line_dash="dash", line_color="red")
+                    pattern_lines.extend(data.index[idx] for idx in info['points'])
                     detected_patterns.append({"Pattern": pattern, "Action": info['action'], "Description": get_pattern_description(pattern)})
                     st.success(f"**{pattern}** detected! Suggested Action: {info['action']}")
                     with st.expander(f"Details: {pattern}"):
@@ -118,8 +166,10 @@ with tab1:
                 xaxis_title="Date",
                 yaxis_title="Price",
                 xaxis_rangeslider_visible=False,
+                shapes=vline_shapes(pattern_lines, dash="dash", color="red"),
                 yaxis2=dict(title="RSI", overlaying="y", side="right", range=[0, 100], showgrid=False) if show_rsi else None
             )
+            instrumentation.observe("figure", time.perf_counter() - figure_start)
             st.plotly_chart(fig, use_container_width=True)
 
             # Export detected patterns
@@ -131,17 +181,17 @@ with tab1:
             # Historical pattern comparison
             st.subheader("Historical Pattern Comparison")
             historical_fig = go.Figure()
-            historical_fig.add_trace(go.Scatter(x=data.index, y=data['Close'], name="Close Price"))
-            for pattern, info in patterns.items():
-                if info['detected'] and info['points']:  # Ensure points exist
-                    try:
-                        # Convert Timestamp to string to avoid Plotly mean calculation error
-                        x_value = data.index[info['points'][-1]].strftime('%Y-%m-%d %H:%M:%S')
-                        historical_fig.add_vline(x=x_value, line_dash="dot", line_color="orange", annotation_text=pattern)
-                    except Exception as e:
-                        logger.error(f"Error adding vline for pattern {pattern}: {str(e)}")
-                        st.warning(f"Could not display historical marker for {pattern}. Please try a different ticker or interval.")
-            historical_fig.update_layout(title=f"Historical Patterns for {ticker}", xaxis_title="Date", yaxis_title="Price")
+            x, y = downsample_line(data.index, data['Close'], n_line_points, keep, downsample_method)
+            historical_fig.add_trace(go.Scattergl(x=x, y=y, name="Close Price"))
+            marked = [(data.index[info['points'][-1]], pattern) for pattern, info in patterns.items()
+                      if info['detected'] and info['points']]  # Ensure points exist
+            historical_fig.update_layout(
+                title=f"Historical Patterns for {ticker}",
+                xaxis_title="Date",
+                yaxis_title="Price",
+                shapes=vline_shapes([x for x, _ in marked], dash="dot", color="orange"),
+                annotations=vline_annotations([x for x, _ in marked], [pattern for _, pattern in marked])
+            )
             st.plotly_chart(historical_fig, use_container_width=True)
 
 with tab2:
@@ -149,7 +199,7 @@ with tab2:
     if ticker and not data.empty:
         look_forward = st.slider("Look-Forward Period for Backtesting", 5, 20, 10, help="Periods to check post-pattern")
         if st.button("Run Backtest"):
-            backtest_results = backtest_patterns(data, patterns, look_forward)
+            backtest_results = cached_backtest(data, fingerprint, sensitivity, look_forward)
             for pattern, stats in backtest_results.items():
                 st.write(f"**{pattern}**")
                 st.write(f"Occurrences: {stats['count']}")
@@ -171,17 +221,42 @@ with tab3:
         st.write("**Exponential Moving Average (EMA)**: 20-period EMA, giving more weight to recent prices.")
         st.write("**Relative Strength Index (RSI)**: Measures momentum (0-100 scale; >70 overbought, <30 oversold).")
         if show_sma:
-            st.write(f"Latest SMA: {data['SMA'].iloc[-1]:.2f}")
+            st.write(f"Latest SMA: {indicator_values['SMA'][-1]:.2f}")
         if show_ema:
-            st.write(f"Latest EMA: {data['EMA'].iloc[-1]:.2f}")
+            st.write(f"Latest EMA: {indicator_values['EMA'][-1]:.2f}")
         if show_rsi:
-            st.write(f"Latest RSI: {data['RSI'].iloc[-1]:.2f}")
+            st.write(f"Latest RSI: {indicator_values['RSI'][-1]:.2f}")
+
+if show_metrics:
+    with st.sidebar.expander("Performance Metrics (all sessions)"):
+        metrics = instrumentation.REGISTRY.snapshot()
+        if metrics["timers"]:
+            st.dataframe(pd.DataFrame.from_dict(metrics["timers"], orient="index"))
+        for cache, rate in metrics["hit_rates"].items():
+            st.write(f"{cache} hit rate: {rate:.0%}")
 
 # Real-time update loop (disabled by default)
 if st.sidebar.checkbox("Enable Real-Time Updates", value=False):
     placeholder = st.empty()
+    alert_placeholder = st.empty()
+    streaming_detector = StreamingPatternDetector(sensitivity)
+    live_indicators = IncrementalIndicators(sma_period=20, ema_period=20, rsi_period=14)
+    last_seen = None
     while True:
-        data, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=ALPHA_VANTAGE_KEY)
+        data, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=ALPHA_VANTAGE_KEY, cache=BAR_CACHE)
         if not data.empty:
             placeholder.dataframe(data.tail())
+            # Feed only the bars that arrived since the last fetch to the streaming detector
+            if last_seen is None:
+                live_patterns = streaming_detector.warm_up(data)
+                live_indicators.warm_up(data['Close'].to_numpy())
+            else:
+                for _, bar in data[data.index > last_seen].iterrows():
+                    live_patterns = streaming_detector.update(bar)
+                    live_indicators.update(bar['Close'])
+            last_seen = data.index[-1]
+            live_detected = [pattern for pattern, info in live_patterns.items() if info['detected']]
+            latest = live_indicators.values
+            alert_placeholder.write(f"Live patterns: {', '.join(live_detected) if live_detected else 'none'} | "
+                                    f"SMA {latest['SMA']:.2f}, EMA {latest['EMA']:.2f}, RSI {latest['RSI']:.2f}")
         time.sleep(60)  # Update every minute
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import count, observe, timer
+from data_fetcher import (BASE_URL, build_request_params, finalize_series, get_output_size,
+                          parse_time_series, validate_request)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Asyncio token bucket shared by all concurrent requests.
+    Holds up to `capacity` tokens and refills `rate` tokens every `per` seconds.
+    """
+
+    def __init__(self, rate=5, per=60.0, capacity=None):
+        self.rate = rate
+        self.per = per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+
+    async def acquire(self):
+        """Waits for a token and takes it. Returns the seconds spent waiting."""
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) * self.per / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+    def drain(self):
+        """Empties the bucket, e.g. after the provider reports its quota is exhausted."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter for the given zero-based attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def create_session(pool_size=16):
+    """Returns a requests session that keeps up to pool_size connections alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+async def fetch_symbol_async(session, bucket, ticker, period, interval, api_key, retries=3,
+                             base_url=BASE_URL, backoff_base=1.0, timeout=30):
+    """
+    Fetches one symbol through the shared session and token bucket.
+    Returns (df, error, seconds); seconds is the time spent on this symbol,
+    including rate-limit waits and retries.
+    """
+    start = time.perf_counter()
+    df, error = await _download_symbol(session, bucket, ticker, period, interval, api_key, retries,
+                                       base_url, backoff_base, timeout)
+    return df, error, time.perf_counter() - start
+
+async def _download_symbol(session, bucket, ticker, period, interval, api_key, retries, base_url, backoff_base,
+                           timeout):
+    error = validate_request(ticker, period, interval, api_key)
+    if error:
+        return pd.DataFrame(), error
+
+    params = build_request_params(ticker, interval, get_output_size(period), api_key)
+    for attempt in range(retries):
+        waited = await bucket.acquire()
+        if waited:
+            observe("throttle_wait", waited)
+        try:
+            # requests is blocking; run it in a worker thread so other symbols proceed
+            with timer("network"):
+                response = await asyncio.to_thread(session.get, base_url, params=params, timeout=timeout)
+            response.raise_for_status()
+            with timer("parse"):
+                df, error, throttled = parse_time_series(response.json(), ticker)
+            if throttled:
+                count("alpha_vantage.throttled")
+            if throttled and attempt < retries - 1:
+                bucket.drain()
+                await asyncio.sleep(backoff_delay(attempt, backoff_base))
+                continue
+            if error:
+                return pd.DataFrame(), error
+            return finalize_series(df, ticker, period, interval)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Attempt {attempt + 1}: Error fetching Alpha Vantage data for {ticker}: {str(e)}")
+            await asyncio.sleep(backoff_delay(attempt, backoff_base))
+        except Exception as e:
+            error_msg = f"Error fetching Alpha Vantage data for {ticker}: {str(e)}. Check API key, network, or ticker."
+            logger.error(error_msg)
+            return pd.DataFrame(), error_msg
+
+    error_msg = (f"Failed to fetch Alpha Vantage data for {ticker} with interval {interval} after {retries} attempts. "
+                 "Check ticker, API key, or try another interval (e.g., 1h or 1d).")
+    logger.error(error_msg)
+    return pd.DataFrame(), error_msg
+
+async def fetch_many_async(symbols, period, interval, api_key, calls_per_minute=5, max_concurrency=8,
+                           retries=3, base_url=BASE_URL, backoff_base=1.0, progress=None):
+    """
+    Fetches many symbols concurrently over one pooled session.
+    All requests share a token bucket sized to the provider's per-minute quota.
+    progress, if given, is called as progress(done, total) as each symbol finishes.
+    Returns a dict mapping each symbol to its (df, error, seconds) tuple.
+    """
+    bucket = TokenBucket(rate=calls_per_minute, per=60.0)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    session = create_session(pool_size=max_concurrency)
+    done = 0
+
+    async def run(symbol):
+        nonlocal done
+        async with semaphore:
+            result = await fetch_symbol_async(session, bucket, symbol, period, interval, api_key,
+                                              retries, base_url, backoff_base)
+        done += 1
+        if progress:
+            progress(done, len(symbols))
+        return result
+
+    try:
+        symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(run(symbol) for symbol in symbols))
+    finally:
+        session.close()
+    return dict(zip(symbols, results))
+
+def fetch_many(symbols, period, interval, api_key, calls_per_minute=5, max_concurrency=8,
+               retries=3, base_url=BASE_URL, backoff_base=1.0, progress=None):
+    """Blocking wrapper around fetch_many_async for scripts and Streamlit."""
+    return asyncio.run(fetch_many_async(symbols, period, interval, api_key, calls_per_minute,
+                                        max_concurrency, retries, base_url, backoff_base, progress))
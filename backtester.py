@@ -1,34 +1,64 @@
 import pandas as pd
 import numpy as np
-from pattern_detector import detect_patterns
+from pattern_detector import PATTERN_ACTIONS, PATTERN_NAMES, enumerate_patterns
+from instrumentation import timed
 
-def backtest_patterns(data, patterns, look_forward=10):
+def forward_returns(close, look_forward=10):
+    """
+    Returns the look_forward-bar forward return for every bar.
+    Bars without enough future data are NaN; look_forward=0 gives zero returns.
+    """
+    if look_forward < 0:
+        raise ValueError(f"look_forward must be zero or positive, got {look_forward}.")
+    close = np.asarray(close, dtype=np.float64)
+    if look_forward == 0:
+        return np.zeros(len(close))
+    returns = np.full(len(close), np.nan)
+    if look_forward < len(close):
+        returns[:-look_forward] = (close[look_forward:] - close[:-look_forward]) / close[:-look_forward]
+    return returns
+
+def walk_forward_backtest(data, look_forward=10, sensitivity=1.0, stride=1, start=0):
+    """
+    Slides over the history every `stride` bars and records each pattern
+    occurrence at the bar where it is first detected, using only pivots
+    confirmed by that bar (no look-ahead).
+    Returns a DataFrame with one row per occurrence.
+    """
+    # Pivots and forward returns are computed once and shared by all patterns
+    occurrences = enumerate_patterns(data, sensitivity, stride, start)
+    returns = forward_returns(data['Close'], look_forward)
+
+    return pd.DataFrame({
+        "pattern": np.array(PATTERN_NAMES, dtype=object)[occurrences["pattern"]],
+        "detection_bar": occurrences["detected_at"],
+        "points": [[int(p) for p in points if p >= 0] for points in occurrences["points"]],
+        "score": occurrences["score"],
+        "forward_return": returns[occurrences["detected_at"]]
+    }, columns=["pattern", "detection_bar", "points", "score", "forward_return"])
+
+@timed("backtest")
+def backtest_patterns(data, patterns, look_forward=10, sensitivity=1.0, stride=1):
     """
     Backtests the reliability of detected patterns with adjustable look-forward period.
+    Every historical occurrence found by a walk-forward pass is scored on the
+    return from its detection bar to look_forward bars later.
     Returns a dictionary with pattern statistics.
     """
+    occurrences = walk_forward_backtest(data, look_forward, sensitivity, stride)
     results = {}
-    
+
     for pattern in patterns:
         stats = {"count": 0, "success_rate": 0.0, "avg_return": 0.0}
-        temp_data = data.copy()
-        
-        # Re-detect patterns for historical data
-        historical_patterns = detect_patterns(temp_data)
-        if historical_patterns[pattern]["detected"]:
-            stats["count"] = len(historical_patterns[pattern]["points"])
-            returns = []
-            
-            for point in historical_patterns[pattern]["points"]:
-                if point + look_forward < len(temp_data):
-                    future_return = (temp_data['Close'].iloc[point + look_forward] - 
-                                   temp_data['Close'].iloc[point]) / temp_data['Close'].iloc[point]
-                    returns.append(future_return)
-            
-            if returns:
+        if pattern in PATTERN_ACTIONS:
+            matched = occurrences[occurrences["pattern"] == pattern]
+            stats["count"] = len(matched)
+            returns = matched["forward_return"].dropna().values
+
+            if len(returns):
                 stats["avg_return"] = np.mean(returns)
-                stats["success_rate"] = len([r for r in returns if r > 0]) / len(returns)
-        
+                stats["success_rate"] = np.count_nonzero(returns > 0) / len(returns)
+
         results[pattern] = stats
-    
-    return results
\ No newline at end of file
+
+    return results
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from data_fetcher import is_market_open
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached series stays fresh while the US market is open (about one bar)
+MARKET_OPEN_TTL = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 60 * 60
+}
+# Seconds a cached series stays fresh while the market is closed
+MARKET_CLOSED_TTL = 6 * 60 * 60
+
+INDEX_FILE = "cache_index.json"
+LOCK_FILE = "cache_index.lock"
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized
+    fcntl = None
+
+# One lock per cache directory, shared by all BarCache instances in the process
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(root):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(root), threading.RLock())
+
+class BarCache:
+    """
+    Persistent on-disk OHLCV cache keyed by symbol and interval.
+    Each series is stored as one .npy file per column (timestamps as int64
+    nanoseconds) and loaded memory-mapped. A JSON index tracks fetch time,
+    last access and size so the least recently used series are evicted once
+    the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, root=".cache/bars", max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, INDEX_FILE)
+        self._lock_path = os.path.join(root, LOCK_FILE)
+        with self._locked():
+            self._index = self._read_index()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Serializes index and file access: a lock shared by every BarCache over
+        the same directory in this process, plus an advisory file lock across
+        processes where fcntl is available.
+        """
+        with _thread_lock(self.root):
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        # Each writer gets its own temp file; the rename is atomic
+        with tempfile.NamedTemporaryFile("w", dir=self.root, suffix=".tmp", delete=False) as f:
+            json.dump(self._index, f)
+        os.replace(f.name, self._index_path)
+
+    @staticmethod
+    def _key(symbol, interval):
+        return re.sub(r"[^A-Za-z0-9.\-]", "_", f"{symbol.upper()}_{interval}")
+
+    def ttl(self, interval):
+        """Returns the freshness TTL in seconds for an interval, depending on market hours."""
+        if is_market_open():
+            return MARKET_OPEN_TTL.get(interval, 60)
+        return MARKET_CLOSED_TTL
+
+    def is_fresh(self, symbol, interval):
+        """Checks whether the cached series was fetched within its TTL."""
+        with self._locked():
+            self._index = self._read_index()
+        entry = self._index.get(self._key(symbol, interval))
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl(interval)
+
+    def load(self, symbol, interval):
+        """
+        Loads a cached series.
+        Returns (df, metadata), or (None, None) when the series is not cached.
+        """
+        key = self._key(symbol, interval)
+        with self._locked():
+            # Other caches over the same directory may have changed the index
+            self._index = self._read_index()
+            entry = self._index.get(key)
+            if entry is None:
+                return None, None
+            path = os.path.join(self.root, key)
+            try:
+                index = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+                columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in entry["columns"]}
+                df = pd.DataFrame({name: np.array(values) for name, values in columns.items()},
+                                  index=pd.DatetimeIndex(np.array(index).view("datetime64[ns]")))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+                self._remove(key)
+                self._write_index()
+                return None, None
+
+            entry["last_access"] = time.time()
+            self._write_index()
+        return df, entry
+
+    def store(self, symbol, interval, df, output_size="full"):
+        """Writes a series to the cache, replacing any previous copy, then enforces the size limit."""
+        key = self._key(symbol, interval)
+        path = os.path.join(self.root, key)
+        with self._locked():
+            os.makedirs(path, exist_ok=True)
+            np.save(os.path.join(path, "index.npy"), df.index.values.astype("datetime64[ns]").view(np.int64))
+            for name in df.columns:
+                np.save(os.path.join(path, f"{name}.npy"), df[name].to_numpy(dtype=np.float64))
+
+            # Merge into the current on-disk index so entries written by others are kept
+            self._index = self._read_index()
+            now = time.time()
+            self._index[key] = {
+                "columns": list(df.columns),
+                "output_size": output_size,
+                "fetched_at": now,
+                "last_access": now,
+                "last_timestamp": str(df.index[-1]) if len(df) else None,
+                "bytes": sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            }
+            self._evict(keep=key)
+            self._write_index()
+
+    def _remove(self, key):
+        self._index.pop(key, None)
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def _evict(self, keep=None):
+        total = sum(entry["bytes"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._index[key]["bytes"]
+            logger.info(f"Evicting cached bars {key}")
+            self._remove(key)
+
+    def clear(self):
+        """Removes every cached series."""
+        with self._locked():
+            self._index = self._read_index()
+            for key in list(self._index):
+                self._remove(key)
+            self._write_index()
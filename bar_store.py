@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+INDEX_FILE = "index.json"
+# Column files and their on-disk dtypes
+COLUMN_DTYPES = {
+    "timestamp": np.int64,
+    "Open": np.float32,
+    "High": np.float32,
+    "Low": np.float32,
+    "Close": np.float32,
+    "Volume": np.int64
+}
+# Days covered by each period, counted back from a symbol's last stored bar
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180}
+
+def _column_path(root, name):
+    return os.path.join(root, f"{name.lower()}.bin")
+
+def write_bar_store(root, frames):
+    """
+    Writes OHLCV frames for many symbols into an on-disk bar store.
+    frames is a dict or an iterable of (symbol, DataFrame) pairs; each frame
+    is appended to one contiguous file per column, so the whole universe
+    never has to be in memory at once. An existing store at root is replaced.
+    Returns the opened BarStore.
+    """
+    os.makedirs(root, exist_ok=True)
+    items = frames.items() if isinstance(frames, dict) else frames
+    files = {name: open(_column_path(root, name), "wb") for name in COLUMN_DTYPES}
+    symbols = {}
+    offset = 0
+    try:
+        for symbol, df in items:
+            df = df.sort_index()
+            columns = {"timestamp": df.index.values.astype("datetime64[ns]").view(np.int64)}
+            columns.update({name: df[name].to_numpy() for name in COLUMN_DTYPES if name != "timestamp"})
+            for name, values in columns.items():
+                np.ascontiguousarray(values, dtype=COLUMN_DTYPES[name]).tofile(files[name])
+            symbols[symbol] = [offset, len(df)]
+            offset += len(df)
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(root, INDEX_FILE), "w") as f:
+        json.dump({"rows": offset, "symbols": symbols,
+                   "columns": {name: np.dtype(dtype).str for name, dtype in COLUMN_DTYPES.items()}}, f)
+    return BarStore(root)
+
+class BarView:
+    """
+    Zero-copy view of one symbol's bars in a BarStore.
+    Supports the parts of the DataFrame interface the detector, backtester and
+    scanner use: view['Close'], len(view), view.index and view.empty.
+    """
+
+    def __init__(self, symbol, index, columns):
+        self.symbol = symbol
+        self.index = index
+        self._columns = columns
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def empty(self):
+        return len(self.index) == 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def to_frame(self):
+        """Copies the view into a regular OHLCV DataFrame."""
+        return pd.DataFrame({name: np.asarray(values) for name, values in self._columns.items()},
+                            index=pd.DatetimeIndex(self.index))
+
+class BarStore:
+    """
+    Read-only, memory-mapped multi-symbol bar store written by write_bar_store.
+    Column files are opened with np.memmap, so slices read through the page
+    cache and can be shared by many processes without copying.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, INDEX_FILE)) as f:
+            meta = json.load(f)
+        self._offsets = {symbol: tuple(span) for symbol, span in meta["symbols"].items()}
+        self._columns = {}
+        for name, dtype in meta["columns"].items():
+            if meta["rows"]:
+                self._columns[name] = np.memmap(_column_path(root, name), dtype=np.dtype(dtype), mode="r",
+                                                shape=(meta["rows"],))
+            else:
+                self._columns[name] = np.empty(0, dtype=np.dtype(dtype))
+
+    @property
+    def symbols(self):
+        return list(self._offsets)
+
+    def __contains__(self, symbol):
+        return symbol in self._offsets
+
+    def get(self, symbol, start=None, end=None):
+        """
+        Returns a BarView of a symbol's bars with start <= timestamp <= end.
+        start and end are anything pd.Timestamp accepts, or None for open ends.
+        """
+        offset, length = self._offsets[symbol]
+        timestamps = self._columns["timestamp"][offset:offset + length]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, pd.Timestamp(start).value, side="left"))
+        hi = length if end is None else int(np.searchsorted(timestamps, pd.Timestamp(end).value, side="right"))
+        lo, hi = offset + lo, offset + max(lo, hi)
+        columns = {name: values[lo:hi] for name, values in self._columns.items() if name != "timestamp"}
+        return BarView(symbol, self._columns["timestamp"][lo:hi].view("datetime64[ns]"), columns)
+
+class BarStoreSource:
+    """
+    Picklable data source reading from a BarStore, with the
+    fetch_alpha_vantage_data signature. Only the path is pickled; each process
+    maps the files itself. Periods are counted back from the symbol's last
+    stored bar, since stores usually hold history rather than live data.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._store = None
+
+    def __getstate__(self):
+        return {"root": self.root, "_store": None}
+
+    def __call__(self, ticker, period, interval=None, api_key=None):
+        if self._store is None:
+            self._store = BarStore(self.root)
+        if ticker not in self._store:
+            return pd.DataFrame(), f"No stored bars for {ticker}."
+        view = self._store.get(ticker)
+        if view.empty or period not in PERIOD_DAYS:
+            return view, None
+        start = view.index[-1] - np.timedelta64(PERIOD_DAYS[period], "D")
+        return self._store.get(ticker, start=start), None
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from pattern_detector import MAX_POINTS, PATTERN_NAMES, get_window
+
+def prepare_price_matrix(data):
+    """
+    Converts close prices for many symbols into an aligned (n_symbols, n_bars) float64 matrix.
+    Accepts a 2-D array, a DataFrame with (symbol, timestamp) MultiIndex rows and a
+    'Close' column, a DataFrame with MultiIndex columns containing a 'Close' level,
+    or a wide DataFrame with one close column per symbol.
+    Bars missing for a symbol are NaN.
+    Returns (prices, symbols).
+    """
+    if isinstance(data, pd.DataFrame):
+        if isinstance(data.index, pd.MultiIndex):
+            wide = data['Close'].unstack(level=0)
+        elif isinstance(data.columns, pd.MultiIndex):
+            level = next(i for i in range(data.columns.nlevels) if 'Close' in data.columns.get_level_values(i))
+            wide = data.xs('Close', axis=1, level=level)
+        else:
+            wide = data
+        return wide.to_numpy(dtype=np.float64).T.copy(), list(wide.columns)
+    prices = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    return prices, list(range(prices.shape[0]))
+
+def _trailing(padded, window, reduce_filter):
+    """
+    Running max/min over the last `window` bars of each row, ending at each
+    bar, in O(n_bars). Windows containing NaN are NaN, like ndarray.max.
+    """
+    extreme = reduce_filter(padded, window, axis=1, origin=(window - 1) // 2)
+    missing = np.isnan(padded)
+    if missing.any():
+        counts = np.cumsum(missing, axis=1)
+        counts[:, window:] -= counts[:, :-window].copy()
+        extreme[counts > 0] = np.nan
+    return extreme
+
+def find_pivot_masks(prices, window):
+    """
+    Marks local maxima and minima of every row with a rolling max/min comparison.
+    Matches argrelextrema(..., order=window) applied to each row separately.
+    Returns (maxima mask, minima mask), both boolean (n_symbols, n_bars).
+    """
+    n_bars = prices.shape[1]
+    # Edge padding reproduces argrelextrema's clipped comparisons at both ends
+    padded = np.pad(prices, ((0, 0), (window, window)), mode="edge")
+    # Bar i compares against the window bars before it (trailing window ending
+    # at padded column i + window - 1) and after it (ending at i + 2 * window)
+    highs = _trailing(padded, window, maximum_filter1d)
+    lows = _trailing(padded, window, minimum_filter1d)
+    with np.errstate(invalid="ignore"):
+        maxima = ((prices > highs[:, window - 1:window - 1 + n_bars]) &
+                  (prices > highs[:, 2 * window:2 * window + n_bars]))
+        minima = ((prices < lows[:, window - 1:window - 1 + n_bars]) &
+                  (prices < lows[:, 2 * window:2 * window + n_bars]))
+    return maxima, minima
+
+def _last_pivots(mask, k):
+    """
+    Returns the bar indices of the last k pivots of each row, oldest first
+    (column k - 1 is the latest pivot), plus the pivot count per row.
+    Missing pivots are -1.
+    """
+    counts = np.cumsum(mask, axis=1)
+    total = counts[:, -1] if mask.shape[1] else np.zeros(mask.shape[0], dtype=np.int64)
+    rows, cols = np.nonzero(mask)
+    rank = total[rows] - counts[rows, cols]  # 0 for the latest pivot
+    keep = rank < k
+    last = np.full((mask.shape[0], k), -1, dtype=np.int64)
+    last[rows[keep], k - 1 - rank[keep]] = cols[keep]
+    return last, total
+
+def _gather(prices, idx):
+    values = np.take_along_axis(prices, np.maximum(idx, 0), axis=1)
+    values[idx < 0] = np.nan
+    return values
+
+def detect_patterns_batch(data, sensitivity=1.0):
+    """
+    Detects chart patterns for many symbols at once using array operations.
+    Applies the same rules as detect_patterns to each row of the price matrix.
+    Returns (detected, points): a boolean (n_symbols, n_patterns) matrix with
+    columns in PATTERN_NAMES order, and an int64 (n_symbols, n_patterns, MAX_POINTS)
+    array of pattern points padded with -1.
+    """
+    prices, _ = prepare_price_matrix(data)
+    n_symbols = prices.shape[0]
+    window = get_window(sensitivity)
+    max_mask, min_mask = find_pivot_masks(prices, window)
+
+    # Last four pivots of each kind; column -1 is the latest, like maxima[-1]
+    mx, n_max = _last_pivots(max_mask, 4)
+    mn, n_min = _last_pivots(min_mask, 4)
+    pmx, pmn = _gather(prices, mx), _gather(prices, mn)
+
+    detected = np.zeros((n_symbols, len(PATTERN_NAMES)), dtype=bool)
+    points = np.full((n_symbols, len(PATTERN_NAMES), MAX_POINTS), -1, dtype=np.int64)
+    threshold = 0.02 * sensitivity
+
+    with np.errstate(invalid="ignore"):
+        rules = {
+            "Double Top": ((n_max >= 2) & (np.abs(pmx[:, -2] - pmx[:, -1]) < threshold * pmx[:, -2]),
+                           mx[:, -2:]),
+            "Double Bottom": ((n_min >= 2) & (np.abs(pmn[:, -2] - pmn[:, -1]) < threshold * pmn[:, -2]),
+                              mn[:, -2:]),
+            "Head and Shoulders": ((n_max >= 3) & (n_min >= 2) &
+                                   (pmx[:, -2] > pmx[:, -3]) & (pmx[:, -2] > pmx[:, -1]) &
+                                   (np.abs(pmx[:, -3] - pmx[:, -1]) < threshold * pmx[:, -2]),
+                                   np.hstack([mx[:, -3:], mn[:, -2:]])),
+            "Flag": ((n_max > 1) & (n_min > 1) & (mx[:, -1] > mn[:, -1]) &
+                     (pmx[:, -1] - pmn[:, -1] < 0.05 * sensitivity * pmx[:, -1]),
+                     np.stack([mn[:, -1], mx[:, -1]], axis=1)),
+            "Pennant": ((n_max > 2) & (n_min > 2) &
+                        (pmx[:, -1] - pmn[:, -1] < 0.03 * sensitivity * pmx[:, -1]) &
+                        (pmx[:, -2] - pmn[:, -2] > 0.05 * sensitivity * pmx[:, -2]),
+                        np.stack([mn[:, -2], mx[:, -2], mn[:, -1], mx[:, -1]], axis=1)),
+            "Triangle": ((n_max > 2) & (n_min > 2) &
+                         (np.std(pmx[:, -3:], axis=1) < 0.02 * sensitivity * np.mean(pmx[:, -3:], axis=1)) &
+                         (np.std(pmn[:, -3:], axis=1) < 0.02 * sensitivity * np.mean(pmn[:, -3:], axis=1)),
+                         np.hstack([mx[:, -3:], mn[:, -3:]])),
+            "Cup and Handle": ((n_min > 3) & (n_max > 1) &
+                               (pmn[:, -4] < pmn[:, -1]) & (pmx[:, -1] > pmx[:, -2]),
+                               np.stack([mn[:, -4], mx[:, -2], mn[:, -1], mx[:, -1]], axis=1))
+        }
+
+    for col, name in enumerate(PATTERN_NAMES):
+        hit, pattern_points = rules[name]
+        detected[:, col] = hit
+        points[hit, col, :pattern_points.shape[1]] = pattern_points[hit]
+
+    return detected, points
+
+def batch_results_frame(detected, symbols):
+    """Labels a detection matrix with symbols and pattern names."""
+    return pd.DataFrame(detected, index=symbols, columns=PATTERN_NAMES)
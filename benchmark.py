@@ -0,0 +1,213 @@
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from backtester import backtest_patterns
+from batch_detector import detect_patterns_batch
+from data_fetcher import parse_time_series
+from indicators import IncrementalIndicators, calculate_ema, calculate_rsi, calculate_sma, compute_indicators
+from pattern_detector import PATTERN_ACTIONS, PATTERN_NAMES, clear_pivot_cache, detect_patterns, enumerate_patterns
+from synthetic_data import generate_ohlcv, generate_universe, to_alpha_vantage_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = "1k,100k"
+# Building and parsing JSON beyond this many bars needs several GB of memory
+PARSE_MAX_BARS = 1_000_000
+# Per-bar indicator updates are a Python loop; beyond this they dominate the run
+INCREMENTAL_MAX_BARS = 1_000_000
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# Bars per planted pattern; wide, gently sloped templates drown in the per-bar
+# noise and stop producing window-20 pivots, so the width does not scale with size
+PLANT_WIDTH = 400
+
+def parse_size(text):
+    """Parses sizes such as 1000, 1k, 100k or 10m."""
+    text = text.strip().lower()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def planted_patterns(n_bars):
+    """Returns the (pattern, start bar, width) list planted into benchmark data of n_bars."""
+    if n_bars < 2 * PLANT_WIDTH:
+        return []
+    return [("Head and Shoulders", n_bars - 2 * PLANT_WIDTH, PLANT_WIDTH),
+            ("Double Top", n_bars - PLANT_WIDTH, PLANT_WIDTH)]
+
+def benchmark_data(n_bars, seed=0):
+    """Synthetic intraday bars with a head and shoulders followed by a double top planted at the end."""
+    return generate_ohlcv(n_bars, seed=seed, freq="1min", patterns=planted_patterns(n_bars))
+
+def check_planted_patterns(data):
+    """
+    Raises RuntimeError unless the planted patterns are found: the double top
+    by detect_patterns (it ends on the last bar) and the head and shoulders by
+    the walk-forward scan over the planted segment.
+    """
+    planted = planted_patterns(len(data))
+    if not planted:
+        return
+    missing = []
+    if not detect_patterns(data)["Double Top"]["detected"]:
+        missing.append("Double Top")
+    occurrences = enumerate_patterns(data, start=planted[0][1])
+    if PATTERN_NAMES.index("Head and Shoulders") not in occurrences["pattern"]:
+        missing.append("Head and Shoulders")
+    if missing:
+        raise RuntimeError(f"Planted patterns not detected in {len(data)} benchmark bars: {', '.join(missing)}")
+
+def _detect(data):
+    clear_pivot_cache()  # measure cold extrema, not memo hits
+    return detect_patterns(data)
+
+def _backtest(data):
+    clear_pivot_cache()
+    return backtest_patterns(data, PATTERN_ACTIONS, look_forward=10)
+
+def _incremental_indicators(close):
+    indicators = IncrementalIndicators(sma_period=20, ema_period=20, rsi_period=14)
+    for value in close:
+        indicators.update(value)
+    return indicators.values
+
+def build_cases(n_bars, seed=0):
+    """Returns (name, callable) pairs for the single-series benchmarks at one size."""
+    data = benchmark_data(n_bars, seed)
+    check_planted_patterns(data)
+    close = data['Close']
+    close_values = close.to_numpy()
+    cases = [
+        ("detect_patterns", lambda: _detect(data)),
+        ("backtest_patterns", lambda: _backtest(data)),
+        ("calculate_sma", lambda: calculate_sma(close, periods=20)),
+        ("calculate_ema", lambda: calculate_ema(close, periods=20)),
+        ("calculate_rsi", lambda: calculate_rsi(close, periods=14)),
+        ("compute_indicators", lambda: compute_indicators(close_values, sma_period=20, ema_period=20, rsi_period=14)),
+    ]
+    if n_bars <= INCREMENTAL_MAX_BARS:
+        cases.append(("IncrementalIndicators.update", lambda: _incremental_indicators(close_values)))
+    else:
+        logger.info(f"Skipping IncrementalIndicators.update at {n_bars} bars (limit {INCREMENTAL_MAX_BARS})")
+    if n_bars <= PARSE_MAX_BARS:
+        response = to_alpha_vantage_json(data, interval="1min")
+        cases.append(("parse_time_series", lambda: parse_time_series(response, "SYN")))
+    else:
+        logger.info(f"Skipping parse_time_series at {n_bars} bars (limit {PARSE_MAX_BARS})")
+    return cases
+
+def build_universe_cases(n_symbols, n_bars, seed=0):
+    """Returns (name, callable) pairs for the multi-symbol benchmarks."""
+    universe = generate_universe(n_symbols, n_bars, seed=seed)
+    matrix = np.vstack([df['Close'].to_numpy() for df in universe.values()])
+
+    def per_symbol():
+        clear_pivot_cache()
+        return [detect_patterns(df) for df in universe.values()]
+
+    return [
+        ("detect_patterns per symbol", per_symbol),
+        ("detect_patterns_batch", lambda: detect_patterns_batch(matrix)),
+    ]
+
+def measure(fn, repeat=3):
+    """Times fn repeat times, then runs it once more under tracemalloc. Returns (median seconds, peak MB)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return float(np.median(times)), peak / 1024 ** 2
+
+def run_benchmarks(sizes, repeat=3, n_symbols=100, universe_bars=1000, seed=0):
+    """Runs all benchmarks. Returns a list of result dicts."""
+    results = []
+
+    def record(name, bars, fn):
+        seconds, peak_mb = measure(fn, repeat)
+        results.append({
+            "case": name,
+            "bars": bars,
+            "seconds": seconds,
+            "bars_per_second": bars / seconds if seconds > 0 else float("inf"),
+            "peak_mb": peak_mb
+        })
+        logger.info(f"{name} [{bars} bars]: {seconds * 1000:.2f} ms, {peak_mb:.1f} MB peak")
+
+    for n_bars in sizes:
+        for name, fn in build_cases(n_bars, seed):
+            record(name, n_bars, fn)
+    if n_symbols > 0:
+        for name, fn in build_universe_cases(n_symbols, universe_bars, seed):
+            record(f"{name} ({n_symbols} symbols)", n_symbols * universe_bars, fn)
+    return results
+
+def _result_key(result):
+    return f"{result['case']}@{result['bars']}"
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Compares results with a stored baseline.
+    Returns the results that are more than `tolerance` slower than the baseline.
+    """
+    previous = {_result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(_result_key(result))
+        if old and result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(dict(result, baseline_seconds=old["seconds"],
+                                    slowdown=result["seconds"] / old["seconds"]))
+    return regressions
+
+def format_results(results):
+    lines = [f"{'case':<45} {'bars':>10} {'ms':>10} {'bars/s':>14} {'peak MB':>9}"]
+    for r in results:
+        lines.append(f"{r['case']:<45} {r['bars']:>10} {r['seconds'] * 1000:>10.2f} "
+                     f"{r['bars_per_second']:>14,.0f} {r['peak_mb']:>9.1f}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pattern detection, backtesting, indicators and response parsing.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated bar counts, e.g. 1k,100k,10m")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (median is reported)")
+    parser.add_argument("--symbols", type=int, default=100, help="Symbols in the universe benchmarks (0 to skip)")
+    parser.add_argument("--universe-bars", type=int, default=1000, help="Bars per symbol in the universe benchmarks")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--baseline", help="Baseline JSON file to compare against")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    results = run_benchmarks(sizes, args.repeat, args.symbols, args.universe_bars, args.seed)
+    print(format_results(results))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "seed": args.seed, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['case']} [{r['bars']} bars]: {r['seconds'] * 1000:.2f} ms vs "
+                  f"{r['baseline_seconds'] * 1000:.2f} ms baseline ({r['slowdown']:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
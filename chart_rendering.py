@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# Line downsampling methods offered in the sidebar
+DOWNSAMPLE_METHODS = {"LTTB": "lttb", "Min/Max": "minmax"}
+# Horizontal pixels per candle when bucketing bars
+PIXELS_PER_CANDLE = 2
+
+def buckets_for_width(width_px, pixels_per_bucket=PIXELS_PER_CANDLE):
+    """Returns the number of buckets that fit a chart width_px pixels wide."""
+    return max(2, int(width_px // pixels_per_bucket))
+
+def pattern_points(patterns):
+    """Returns the sorted, unique bar indices referenced by detected patterns."""
+    points = [p for info in patterns.values() if info['detected'] for p in info['points']]
+    return np.unique(np.asarray(points, dtype=np.int64))
+
+def bucket_edges(n, n_buckets, keep=()):
+    """
+    Splits n bars into about n_buckets equal buckets and returns the bucket
+    boundaries (starting with 0, ending with n). Every bar in keep gets a bucket
+    of its own, so pivots survive aggregation unchanged.
+    """
+    edges = np.linspace(0, n, min(n_buckets, n) + 1).astype(np.int64)
+    keep = np.asarray(keep, dtype=np.int64)
+    keep = keep[(keep >= 0) & (keep < n)]
+    return np.unique(np.concatenate([edges, keep, keep + 1]))
+
+def lttb_indices(y, n_out, keep=()):
+    """
+    Largest-Triangle-Three-Buckets: picks about n_out bars that preserve the
+    visual shape of y. Bars in keep are always included.
+    Returns sorted bar indices.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        selected = np.array([0, n - 1], dtype=np.int64)
+    else:
+        # n_out - 2 buckets between the fixed first and last bars
+        edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+        selected = np.empty(n_out, dtype=np.int64)
+        selected[0], selected[-1] = 0, n - 1
+        a = 0
+        for i in range(n_out - 2):
+            lo, hi = edges[i], edges[i + 1]
+            next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+            avg_x = (next_lo + next_hi - 1) / 2
+            avg_y = y[next_lo:next_hi].mean()
+            xs = np.arange(lo, hi)
+            area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+            a = lo + int(np.argmax(area))
+            selected[i + 1] = a
+    return np.union1d(selected, np.asarray(keep, dtype=np.int64))
+
+def minmax_indices(y, n_buckets, keep=()):
+    """
+    Keeps the first lowest and highest bar of each of n_buckets buckets, plus
+    the first and last bars and every bar in keep.
+    Returns sorted bar indices.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    edges = bucket_edges(n, n_buckets)
+    starts = edges[:-1]
+    bucket_of = np.repeat(np.arange(len(starts)), np.diff(edges))
+    selected = [np.array([0, n - 1]), np.asarray(keep, dtype=np.int64)]
+    for reduce in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == reduce.reduceat(y, starts)[bucket_of])
+        selected.append(hits[np.searchsorted(hits, starts)])
+    return np.unique(np.concatenate(selected))
+
+def downsample_line(x, y, n_out, keep=(), method="lttb"):
+    """
+    Reduces a line overlay to about n_out points with LTTB or min/max bucketing.
+    NaN bars (e.g. indicator warm-up) are dropped; bars in keep are preserved.
+    Returns (x, y).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= n_out:
+        return x, y
+    valid = np.flatnonzero(~np.isnan(y))
+    keep = np.asarray(keep, dtype=np.int64)
+    pos = np.searchsorted(valid, keep)
+    keep = pos[(pos < len(valid)) & (valid[np.minimum(pos, len(valid) - 1)] == keep)]
+    if method == "minmax":
+        idx = valid[minmax_indices(y[valid], n_out // 2, keep)]
+    else:
+        idx = valid[lttb_indices(y[valid], n_out, keep)]
+    return x[idx], y[idx]
+
+def downsample_ohlc(data, n_buckets, keep=()):
+    """
+    Aggregates OHLC(V) bars into about n_buckets candles (first open, highest
+    high, lowest low, last close, summed volume), each stamped with its first
+    bar's time. Bars in keep stay as their own candles.
+    Returns data unchanged when it already fits.
+    """
+    n = len(data)
+    if n <= n_buckets:
+        return data
+    edges = bucket_edges(n, n_buckets, keep)
+    starts = edges[:-1]
+    columns = {
+        "Open": np.asarray(data['Open'])[starts],
+        "High": np.maximum.reduceat(np.asarray(data['High']), starts),
+        "Low": np.minimum.reduceat(np.asarray(data['Low']), starts),
+        "Close": np.asarray(data['Close'])[edges[1:] - 1]
+    }
+    if "Volume" in data.columns:
+        columns["Volume"] = np.add.reduceat(np.asarray(data['Volume']), starts)
+    return pd.DataFrame(columns, index=data.index[starts])
+
+def vline_shapes(xs, dash="dash", color="red"):
+    """Returns full-height vertical line shapes for a layout's shapes list."""
+    return [dict(type="line", xref="x", yref="paper", x0=x, x1=x, y0=0, y1=1,
+                 line=dict(dash=dash, color=color, width=1)) for x in xs]
+
+def vline_annotations(xs, texts):
+    """Returns labels placed at the top of vertical lines, for a layout's annotations list."""
+    return [dict(x=x, xref="x", y=1, yref="paper", text=text, showarrow=False, xanchor="left", yanchor="top")
+            for x, text in zip(xs, texts)]
@@ -1,8 +1,11 @@
+import json
+import numpy as np
 import pandas as pd
 import requests
 import time
 import logging
 from datetime import datetime
+from instrumentation import count, timer
 
 logger = logging.getLogger(__name__)
 
@@ -31,27 +34,31 @@ VALID_COMBINATIONS = {
     "1d": ["1d", "5d", "1mo", "3mo", "6mo"]
 }
 
-def fetch_alpha_vantage_data(ticker, period, interval, api_key, retries=3):
-    if not ticker:
-        return pd.DataFrame(), "Please enter a valid ticker (e.g., AAPL, RELIANCE.NS)."
-    if not api_key:
-        return pd.DataFrame(), "Alpha Vantage API key is required."
-    
-    if interval not in VALID_COMBINATIONS or period not in VALID_COMBINATIONS[interval]:
-        return pd.DataFrame(), f"Invalid interval {interval} for period {period}. Use 1m or 5m for 1d/5d, or 15m/1h for longer periods."
+# Bar length of each interval
+INTERVAL_TIMEDELTAS = {
+    "1m": pd.Timedelta(minutes=1),
+    "5m": pd.Timedelta(minutes=5),
+    "15m": pd.Timedelta(minutes=15),
+    "1h": pd.Timedelta(hours=1),
+    "1d": pd.Timedelta(days=1)
+}
 
-    if interval == "1m" and not is_market_open():
-        return pd.DataFrame(), f"1m data for {ticker} is only available during US market hours (9:30 AM - 4:00 PM ET, Mon-Fri). Try 5m or 15m."
+# Number of bars returned by outputsize=compact
+COMPACT_BARS = 100
+
+# Calendar days covered by each period
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180}
 
+BASE_URL = "https://www.alphavantage.co/query"
+
+def get_output_size(period):
+    """Maps a period to the Alpha Vantage output size that covers it."""
+    return "compact" if period in ["1d", "5d"] else "full"
+
+def build_request_params(ticker, interval, output_size, api_key):
+    """Returns the Alpha Vantage query parameters for a time series request."""
     av_interval = ALPHA_VANTAGE_INTERVALS.get(interval)
-    if not av_interval:
-        return pd.DataFrame(), f"Unsupported interval {interval} for Alpha Vantage."
-
-    # Map period to Alpha Vantage output size
-    output_size = "compact" if period in ["1d", "5d"] else "full"
-    
-    base_url = "https://www.alphavantage.co/query"
-    params = {
+    return {
         "function": "TIME_SERIES_INTRADAY" if interval in ["1m", "5m", "15m", "1h"] else "TIME_SERIES_DAILY",
         "symbol": ticker,
         "interval": av_interval if interval in ["1m", "5m", "15m", "1h"] else None,
@@ -59,71 +66,223 @@ def fetch_alpha_vantage_data(ticker, period, interval, api_key, retries=3):
         "apikey": api_key,
         "datatype": "json"
     }
-    
+
+# Alpha Vantage bar fields and the column names used throughout the app
+RESPONSE_COLUMNS = {
+    "1. open": "Open",
+    "2. high": "High",
+    "3. low": "Low",
+    "4. close": "Close",
+    "5. volume": "Volume"
+}
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+def series_to_frame(series, price_dtype=np.float64):
+    """
+    Builds an OHLCV DataFrame straight from an Alpha Vantage time series dict.
+    Each column is parsed into a preallocated array of its final dtype, so no
+    intermediate object-dtype frame is created. Prices can be stored as
+    float32 with price_dtype=np.float32. Responses come newest first; already
+    ordered input is reversed or kept as is instead of being sorted.
+    """
+    n_bars = len(series)
+    bars = list(series.values())
+    timestamps = np.array(list(series.keys()), dtype="datetime64[ns]")
+    fields = list(bars[0]) if n_bars else list(RESPONSE_COLUMNS)
+
+    columns = {}
+    for field in fields:
+        name = RESPONSE_COLUMNS.get(field, field)
+        dtype = price_dtype if name in PRICE_COLUMNS else np.float64
+        columns[name] = np.fromiter((float(bar[field]) for bar in bars), dtype=dtype, count=n_bars)
+
+    if n_bars > 1:
+        steps = np.diff(timestamps)
+        if (steps < np.timedelta64(0)).all():
+            order = slice(None, None, -1)
+        elif (steps > np.timedelta64(0)).all():
+            order = slice(None)
+        else:
+            order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        columns = {name: values[order] for name, values in columns.items()}
+
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(timestamps))
+
+def parse_time_series(data, ticker, price_dtype=np.float64):
+    """
+    Converts a decoded Alpha Vantage response into an OHLCV DataFrame sorted by time.
+    Returns (df, error, throttled); throttled is True when the API quota note was returned.
+    """
+    # Check for API errors
+    if "Error Message" in data:
+        return pd.DataFrame(), f"Alpha Vantage error: {data['Error Message']}. Check ticker or API key.", False
+    if "Note" in data:
+        logger.warning(f"Alpha Vantage limit reached: {data['Note']}")
+        return pd.DataFrame(), f"Alpha Vantage API limit reached: {data['Note']}. Wait 1–2 minutes or upgrade to premium.", True
+
+    # Parse data
+    time_series_key = next((key for key in data if "Time Series" in key), None)
+    if not time_series_key:
+        return pd.DataFrame(), f"No time series data found for {ticker}. Check ticker or API availability.", False
+
+    return series_to_frame(data[time_series_key], price_dtype), None, False
+
+def parse_time_series_bytes(raw, ticker, price_dtype=np.float64):
+    """Parses a raw (bytes or str) Alpha Vantage JSON response, e.g. a stored one. Same return as parse_time_series."""
     try:
-        for attempt in range(retries):
-            try:
-                response = requests.get(base_url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Check for API errors
-                if "Error Message" in data:
-                    return pd.DataFrame(), f"Alpha Vantage error: {data['Error Message']}. Check ticker or API key."
-                if "Note" in data:
-                    logger.warning(f"Alpha Vantage limit reached: {data['Note']}")
-                    if attempt < retries - 1:
-                        time.sleep(60)  # Wait 1 minute for API limit reset
-                        continue
-                    return pd.DataFrame(), f"Alpha Vantage API limit reached: {data['Note']}. Wait 1–2 minutes or upgrade to premium."
-                
-                # Parse data
-                time_series_key = next((key for key in data if "Time Series" in key), None)
-                if not time_series_key:
-                    return pd.DataFrame(), f"No time series data found for {ticker}. Check ticker or API availability."
-                
-                df = pd.DataFrame.from_dict(data[time_series_key], orient="index")
-                df = df.rename(columns={
-                    "1. open": "Open",
-                    "2. high": "High",
-                    "3. low": "Low",
-                    "4. close": "Close",
-                    "5. volume": "Volume"
-                })
-                df = df.astype(float)
-                df.index = pd.to_datetime(df.index, utc=True).tz_convert(None)  # Ensure timezone-naive index
-                df = df.sort_index()
-                
-                # Filter data based on period
-                if period != "6mo":
-                    period_map = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90}
-                    days = period_map.get(period, 180)
-                    try:
-                        # Use timezone-naive Timestamp for cutoff
-                        cutoff = pd.Timestamp.now().tz_localize(None) - pd.Timedelta(days=days)
-                        if not isinstance(df.index, pd.DatetimeIndex):
-                            logger.error(f"DataFrame index is not DatetimeIndex: {type(df.index)}")
-                            return pd.DataFrame(), f"Invalid DataFrame index for {ticker}. Contact support."
-                        logger.debug(f"Filtering data for {ticker}: index dtype={df.index.dtype}, cutoff={cutoff}, cutoff dtype={type(cutoff)}")
-                        df = df[df.index >= cutoff]
-                    except Exception as e:
-                        logger.error(f"Error filtering data for {ticker}: {str(e)}")
-                        return pd.DataFrame(), f"Error filtering data for {ticker}: {str(e)}. Try a different period (e.g., 5d) or interval (e.g., 15m)."
-                
-                if df.empty:
-                    return pd.DataFrame(), f"No Alpha Vantage data for {ticker} with interval {interval}. Try another interval or ticker."
-                
-                logger.info(f"Successfully fetched Alpha Vantage data for {ticker} with interval {interval}")
-                return df, None
-            except (requests.RequestException, ValueError) as e:
-                logger.error(f"Attempt {attempt + 1}: Error fetching Alpha Vantage data for {ticker}: {str(e)}")
-                time.sleep(10)
-        
-        error_msg = (f"Failed to fetch Alpha Vantage data for {ticker} with interval {interval} after {retries} attempts. "
-                     "Check ticker, API key, or try another interval (e.g., 1h or 1d).")
-        logger.error(error_msg)
-        return pd.DataFrame(), error_msg
+        data = json.loads(raw)
+    except ValueError as e:
+        return pd.DataFrame(), f"Invalid Alpha Vantage response for {ticker}: {str(e)}", False
+    return parse_time_series(data, ticker, price_dtype)
+
+def parse_time_series_file(path, ticker, price_dtype=np.float64):
+    """Parses an Alpha Vantage JSON response saved to a file. Same return as parse_time_series."""
+    with open(path, "rb") as f:
+        return parse_time_series_bytes(f.read(), ticker, price_dtype)
+
+def filter_by_period(df, period, ticker):
+    """
+    Keeps only the bars inside the requested period.
+    Returns (df, error).
+    """
+    if period == "6mo":
+        return df, None
+    days = PERIOD_DAYS.get(period, 180)
+    try:
+        # Use timezone-naive Timestamp for cutoff
+        cutoff = pd.Timestamp.now().tz_localize(None) - pd.Timedelta(days=days)
+        if not isinstance(df.index, pd.DatetimeIndex):
+            logger.error(f"DataFrame index is not DatetimeIndex: {type(df.index)}")
+            return pd.DataFrame(), f"Invalid DataFrame index for {ticker}. Contact support."
+        logger.debug(f"Filtering data for {ticker}: index dtype={df.index.dtype}, cutoff={cutoff}, cutoff dtype={type(cutoff)}")
+        return df[df.index >= cutoff], None
+    except Exception as e:
+        logger.error(f"Error filtering data for {ticker}: {str(e)}")
+        return pd.DataFrame(), f"Error filtering data for {ticker}: {str(e)}. Try a different period (e.g., 5d) or interval (e.g., 15m)."
+
+def validate_request(ticker, period, interval, api_key):
+    """Checks a fetch request before any network call. Returns an error message or None."""
+    if not ticker:
+        return "Please enter a valid ticker (e.g., AAPL, RELIANCE.NS)."
+    if not api_key:
+        return "Alpha Vantage API key is required."
+
+    if interval not in VALID_COMBINATIONS or period not in VALID_COMBINATIONS[interval]:
+        return f"Invalid interval {interval} for period {period}. Use 1m or 5m for 1d/5d, or 15m/1h for longer periods."
+
+    if interval == "1m" and not is_market_open():
+        return f"1m data for {ticker} is only available during US market hours (9:30 AM - 4:00 PM ET, Mon-Fri). Try 5m or 15m."
+
+    if not ALPHA_VANTAGE_INTERVALS.get(interval):
+        return f"Unsupported interval {interval} for Alpha Vantage."
+    return None
+
+def finalize_series(df, ticker, period, interval):
+    """
+    Trims a downloaded series to the requested period and checks it is not empty.
+    Returns (df, error).
+    """
+    # Filter data based on period
+    with timer("filter"):
+        df, error = filter_by_period(df, period, ticker)
+    if error:
+        return pd.DataFrame(), error
+
+    if df.empty:
+        return pd.DataFrame(), f"No Alpha Vantage data for {ticker} with interval {interval}. Try another interval or ticker."
+
+    logger.info(f"Successfully fetched Alpha Vantage data for {ticker} with interval {interval}")
+    return df, None
+
+def download_time_series(ticker, interval, output_size, api_key, retries=3):
+    """
+    Requests a time series from Alpha Vantage, retrying on network errors and API throttling.
+    Returns (df, error) with the full, unfiltered series.
+    """
+    params = build_request_params(ticker, interval, output_size, api_key)
+    for attempt in range(retries):
+        try:
+            with timer("network"):
+                response = requests.get(BASE_URL, params=params)
+            response.raise_for_status()
+            with timer("parse"):
+                df, error, throttled = parse_time_series(response.json(), ticker)
+            if throttled:
+                count("alpha_vantage.throttled")
+            if throttled and attempt < retries - 1:
+                with timer("throttle_wait"):
+                    time.sleep(60)  # Wait 1 minute for API limit reset
+                continue
+            return df, error
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Attempt {attempt + 1}: Error fetching Alpha Vantage data for {ticker}: {str(e)}")
+            time.sleep(10)
+
+    error_msg = (f"Failed to fetch Alpha Vantage data for {ticker} with interval {interval} after {retries} attempts. "
+                 "Check ticker, API key, or try another interval (e.g., 1h or 1d).")
+    logger.error(error_msg)
+    return pd.DataFrame(), error_msg
+
+def _fetch_with_cache(ticker, period, interval, api_key, retries, cache):
+    """
+    Serves a request from the on-disk cache, downloading only what is missing.
+    If refreshing a stale series fails (e.g. the API quota is used up), the
+    stale copy is served with a warning; errors are only returned when
+    nothing usable is cached.
+    Returns (df, error) with the full cached series.
+    """
+    output_size = get_output_size(period)
+    cached, meta = cache.load(ticker, interval)
+    covers_period = cached is not None and (output_size == "compact" or meta["output_size"] == "full")
+
+    if covers_period and cache.is_fresh(ticker, interval):
+        count("bar_cache.hit")
+        return cached, None
+    count("bar_cache.miss")
+
+    if covers_period and not cached.empty:
+        # Top up with the latest bars if they reach back to the last cached bar
+        bars_missing = (pd.Timestamp.now().tz_localize(None) - cached.index[-1]) / INTERVAL_TIMEDELTAS[interval]
+        if bars_missing < COMPACT_BARS:
+            latest, error = download_time_series(ticker, interval, "compact", api_key, retries)
+            if error:
+                logger.warning(f"Serving stale cached data for {ticker} with interval {interval}: {error}")
+                return cached, None
+            if not latest.empty and latest.index[0] <= cached.index[-1]:
+                merged = pd.concat([cached, latest])
+                merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                logger.info(f"Topped up cached data for {ticker} with interval {interval}: {len(merged) - len(cached)} new bars")
+                cache.store(ticker, interval, merged, meta["output_size"])
+                return merged, None
+
+    df, error = download_time_series(ticker, interval, output_size, api_key, retries)
+    if error and covers_period and not cached.empty:
+        logger.warning(f"Serving stale cached data for {ticker} with interval {interval}: {error}")
+        return cached, None
+    if not error:
+        cache.store(ticker, interval, df, output_size)
+    return df, error
+
+def fetch_alpha_vantage_data(ticker, period, interval, api_key, retries=3, cache=None):
+    """
+    Fetches OHLCV data for a ticker and trims it to the requested period.
+    When a BarCache is given, bars are served from disk and only newer bars are downloaded.
+    Returns (df, error).
+    """
+    error = validate_request(ticker, period, interval, api_key)
+    if error:
+        return pd.DataFrame(), error
+
+    try:
+        if cache is not None:
+            df, error = _fetch_with_cache(ticker, period, interval, api_key, retries, cache)
+        else:
+            df, error = download_time_series(ticker, interval, get_output_size(period), api_key, retries)
+        if error:
+            return pd.DataFrame(), error
+        return finalize_series(df, ticker, period, interval)
     except Exception as e:
         error_msg = f"Error fetching Alpha Vantage data for {ticker}: {str(e)}. Check API key, network, or ticker."
         logger.error(error_msg)
-        return pd.DataFrame(), error_msg
\ No newline at end of file
+        return pd.DataFrame(), error_msg
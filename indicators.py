@@ -0,0 +1,138 @@
+from collections import deque
+import pandas as pd
+import numpy as np
+from scipy.signal import lfilter
+
+def calculate_sma(data, periods=20):
+    """Simple moving average of a price Series."""
+    return data.rolling(window=periods).mean()
+
+def calculate_ema(data, periods=20):
+    """Exponential moving average of a price Series."""
+    return data.ewm(span=periods, adjust=False).mean()
+
+# Custom RSI calculation
+def calculate_rsi(data, periods=14):
+    delta = data.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+INDICATOR_NAMES = ["SMA", "EMA", "RSI"]
+
+def _rolling_mean(values, periods):
+    """Trailing mean over `periods` values; the first periods - 1 entries are NaN."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= periods:
+        # Centre on the first value so long cumulative sums keep their precision
+        offset = values[0]
+        sums = np.cumsum(np.concatenate(([0.0], values - offset)))
+        out[periods - 1:] = (sums[periods:] - sums[:-periods]) / periods + offset
+    return out
+
+def _rsi_from_means(gain, loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + gain / loss))
+
+def compute_indicators(close, sma_period=20, ema_period=20, rsi_period=14, dtype=np.float64):
+    """
+    Computes SMA, EMA and RSI of a close price array in one vectorized pass.
+    Values match calculate_sma, calculate_ema and calculate_rsi. The input is
+    not modified; results go to a separate dict of arrays (use dtype=np.float32
+    for a more compact store).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    store = {"SMA": _rolling_mean(close, sma_period)}
+
+    # EMA with adjust=False: y[0] = x[0], y[t] = (1 - a) * y[t - 1] + a * x[t]
+    alpha = 2 / (ema_period + 1)
+    if len(close):
+        store["EMA"] = lfilter([alpha], [1, alpha - 1], close, zi=[(1 - alpha) * close[0]])[0]
+    else:
+        store["EMA"] = np.empty(0)
+
+    # Like calculate_rsi, the undefined first change counts as zero gain and loss
+    delta = np.diff(close, prepend=close[:1])
+    gain = _rolling_mean(np.maximum(delta, 0), rsi_period)
+    loss = _rolling_mean(np.maximum(-delta, 0), rsi_period)
+    store["RSI"] = _rsi_from_means(gain, loss)
+
+    return {name: values.astype(dtype, copy=False) for name, values in store.items()}
+
+class IncrementalIndicators:
+    """
+    Running SMA, EMA and RSI state that is updated in O(1) per new close.
+    Keeps rolling sums for the SMA and the RSI gain/loss averages and the last
+    EMA value, so the real-time loop does not recompute the whole series.
+    """
+
+    def __init__(self, sma_period=20, ema_period=20, rsi_period=14):
+        self.sma_period = sma_period
+        self.ema_period = ema_period
+        self.rsi_period = rsi_period
+        self.alpha = 2 / (ema_period + 1)
+        self.reset()
+
+    def reset(self):
+        """Clears all state."""
+        self._closes = deque(maxlen=self.sma_period)
+        self._close_sum = 0.0
+        self._gains = deque(maxlen=self.rsi_period)
+        self._losses = deque(maxlen=self.rsi_period)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        self.last_close = None
+        self.ema = np.nan
+        self.values = {name: np.nan for name in INDICATOR_NAMES}
+
+    def warm_up(self, close):
+        """
+        Seeds the state from a close price history.
+        Returns the full indicator arrays for that history (as compute_indicators).
+        """
+        close = np.asarray(close, dtype=np.float64)
+        self.reset()
+        store = compute_indicators(close, self.sma_period, self.ema_period, self.rsi_period)
+        if len(close) == 0:
+            return store
+        self._closes.extend(close[-self.sma_period:])
+        self._close_sum = float(np.sum(self._closes))
+        delta = np.diff(close, prepend=close[:1])[-self.rsi_period:]
+        self._gains.extend(np.maximum(delta, 0))
+        self._losses.extend(np.maximum(-delta, 0))
+        self._gain_sum = float(np.sum(self._gains))
+        self._loss_sum = float(np.sum(self._losses))
+        self.last_close = float(close[-1])
+        self.ema = float(store["EMA"][-1])
+        self.values = {name: float(values[-1]) for name, values in store.items()}
+        return store
+
+    def update(self, close):
+        """Adds one close price. Returns the latest {"SMA", "EMA", "RSI"} values."""
+        close = float(close)
+
+        if len(self._closes) == self.sma_period:
+            self._close_sum -= self._closes[0]
+        self._closes.append(close)
+        self._close_sum += close
+        sma = self._close_sum / self.sma_period if len(self._closes) == self.sma_period else np.nan
+
+        self.ema = close if self.last_close is None else (1 - self.alpha) * self.ema + self.alpha * close
+
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        if len(self._gains) == self.rsi_period:
+            self._gain_sum -= self._gains[0]
+            self._loss_sum -= self._losses[0]
+        self._gains.append(max(delta, 0.0))
+        self._losses.append(max(-delta, 0.0))
+        self._gain_sum += self._gains[-1]
+        self._loss_sum += self._losses[-1]
+        rsi = np.nan
+        if len(self._gains) == self.rsi_period:
+            rsi = float(_rsi_from_means(np.float64(self._gain_sum) / self.rsi_period,
+                                        np.float64(self._loss_sum) / self.rsi_period))
+        self.last_close = close
+
+        self.values = {"SMA": sma, "EMA": self.ema, "RSI": rsi}
+        return self.values
@@ -0,0 +1,168 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Collection is off unless PATTERN_METRICS is set (or enable() is called);
+# while off, timers and counters cost one flag check.
+_enabled = os.environ.get("PATTERN_METRICS", "") not in ("", "0")
+
+class MetricsRegistry:
+    """
+    In-memory sink: sums counters and keeps count, total and max seconds per timer.
+    Counters named "<cache>.hit" and "<cache>.miss" are reported as hit rates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+
+    def record(self, kind, name, value):
+        with self._lock:
+            if kind == "counter":
+                self._counters[name] = self._counters.get(name, 0) + value
+                return
+            stats = self._timers.get(name)
+            if stats is None:
+                stats = self._timers[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += value
+            stats["max"] = max(stats["max"], value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def hit_rates(self):
+        """Returns {cache: hits / (hits + misses)} for every cache with lookups."""
+        with self._lock:
+            counters = dict(self._counters)
+        caches = {name.rsplit(".", 1)[0] for name in counters if name.endswith((".hit", ".miss"))}
+        rates = {}
+        for cache in sorted(caches):
+            hits, misses = counters.get(f"{cache}.hit", 0), counters.get(f"{cache}.miss", 0)
+            rates[cache] = hits / (hits + misses)
+        return rates
+
+    def snapshot(self):
+        """Returns {"counters", "timers", "hit_rates"} as plain dictionaries."""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {name: dict(stats) for name, stats in self._timers.items()}
+        return {"counters": counters, "timers": timers, "hit_rates": self.hit_rates()}
+
+    def to_prometheus(self, prefix="pattern_detector"):
+        """Renders the registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{name="{_label(name)}"}} {value}'
+                  for name, value in sorted(snapshot["counters"].items())]
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for name, stats in sorted(snapshot["timers"].items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{_label(name)}"}} {stats["total"]:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{_label(name)}"}} {stats["count"]}')
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        lines += [f'{prefix}_stage_seconds_max{{stage="{_label(name)}"}} {stats["max"]:.9f}'
+                  for name, stats in sorted(snapshot["timers"].items())]
+        lines.append(f"# TYPE {prefix}_cache_hit_ratio gauge")
+        lines += [f'{prefix}_cache_hit_ratio{{cache="{_label(name)}"}} {rate:.6f}'
+                  for name, rate in snapshot["hit_rates"].items()]
+        return "\n".join(lines) + "\n"
+
+class LogSink:
+    """Writes every measurement as one JSON log line."""
+
+    def __init__(self, log=logger, level=logging.INFO):
+        self.log = log
+        self.level = level
+
+    def record(self, kind, name, value):
+        self.log.log(self.level, json.dumps({"metric": name, "kind": kind, "value": value}))
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+# Default sink; more can be attached with add_sink
+REGISTRY = MetricsRegistry()
+_sinks = [REGISTRY]
+
+def enable():
+    """Turns metric collection on."""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """Turns metric collection off; recorded values are kept."""
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def add_sink(sink):
+    """Attaches a sink, any object with record(kind, name, value)."""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+def count(name, value=1):
+    """Adds value to a counter."""
+    if _enabled:
+        for sink in _sinks:
+            sink.record("counter", name, value)
+
+def observe(name, seconds):
+    """Records one timing of a stage."""
+    if _enabled:
+        for sink in _sinks:
+            sink.record("timer", name, seconds)
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name):
+    """Context manager timing a stage; a shared no-op while collection is off."""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+def timed(name):
+    """Decorator timing every call of a function as the given stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,201 @@
+import argparse
+import logging
+import os
+import sys
+
+import pandas as pd
+from data_fetcher import INTERVAL_TIMEDELTAS, PERIOD_DAYS, fetch_alpha_vantage_data
+from pattern_detector import PATTERN_ACTIONS, PATTERN_NAMES, detect_patterns, get_window
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEFRAMES = ("15m", "1h", "1d")
+# pandas resample rule for each interval
+RESAMPLE_RULES = {"1m": "1min", "5m": "5min", "15m": "15min", "1h": "1h", "1d": "1D"}
+OHLCV_AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+CONFLUENCE_COLUMNS = ["Pattern", "Action", "Timeframes", "Timeframe Count", "Latest Signal"]
+# Alpha Vantage serves only about the last 30 days of intraday bars, even with outputsize=full
+INTRADAY_HISTORY_DAYS = 30
+
+def sort_timeframes(intervals):
+    """Returns the unique intervals ordered from finest to coarsest."""
+    return sorted(dict.fromkeys(intervals), key=INTERVAL_TIMEDELTAS.__getitem__)
+
+def resample_ohlcv(df, interval):
+    """
+    Aggregates OHLCV bars into a coarser interval (first open, highest high,
+    lowest low, last close, summed volume). Bars are labelled by the start of
+    their bucket; buckets without any base bar are dropped.
+    """
+    agg = {column: how for column, how in OHLCV_AGGREGATION.items() if column in df.columns}
+    resampled = df.resample(RESAMPLE_RULES[interval], label="left", closed="left").agg(agg)
+    return resampled.dropna(subset=["Close"])
+
+def derive_timeframes(base, base_interval, intervals=DEFAULT_TIMEFRAMES):
+    """
+    Builds every requested interval from one base series.
+    Intervals finer than base_interval cannot be derived and raise ValueError.
+    Returns {interval: DataFrame}, finest first.
+    """
+    frames = {}
+    for interval in sort_timeframes(intervals):
+        if INTERVAL_TIMEDELTAS[interval] < INTERVAL_TIMEDELTAS[base_interval]:
+            raise ValueError(f"Cannot derive {interval} bars from {base_interval} bars.")
+        frames[interval] = base if interval == base_interval else resample_ohlcv(base, interval)
+    return frames
+
+def needs_native_fetch(interval, base_interval, period):
+    """
+    Returns True when interval cannot be derived from base_interval bars over
+    the whole period: intraday bars only reach back INTRADAY_HISTORY_DAYS, so
+    daily bars for a longer period have to be fetched as daily bars.
+    """
+    return base_interval != "1d" and interval == "1d" and PERIOD_DAYS.get(period, 180) > INTRADAY_HISTORY_DAYS
+
+def fetch_timeframes(ticker, period, api_key, intervals=DEFAULT_TIMEFRAMES, base_interval=None, cache=None):
+    """
+    Fetches the finest interval once and resamples it into the coarser ones,
+    so a multi-timeframe view usually costs a single API call. Intraday data
+    only covers about the last 30 days, so for longer periods daily bars are
+    fetched natively (see needs_native_fetch), at the cost of one more call.
+    Daily bars built from intraday data only cover the hours the provider
+    reports intraday.
+    Returns ({interval: DataFrame}, error).
+    """
+    intervals = sort_timeframes(intervals)
+    base_interval = base_interval or intervals[0]
+    native = [interval for interval in intervals if needs_native_fetch(interval, base_interval, period)]
+    derived = [interval for interval in intervals if interval not in native]
+
+    frames = {}
+    if derived:
+        base, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=base_interval, api_key=api_key, cache=cache)
+        if error:
+            return {}, error
+        try:
+            frames.update(derive_timeframes(base, base_interval, derived))
+        except ValueError as e:
+            return {}, str(e)
+    for interval in native:
+        df, error = fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=api_key, cache=cache)
+        if error:
+            return {}, error
+        frames[interval] = df
+    return {interval: frames[interval] for interval in intervals}, None
+
+def min_bars(sensitivity=1.0):
+    """Returns the fewest bars a pattern can be detected in: two pivots, each with a full window on both sides."""
+    return 2 * get_window(sensitivity) + 1
+
+def short_timeframes(frames, sensitivity=1.0):
+    """Returns {interval: bar count} for the timeframes too short to detect any pattern in."""
+    return {interval: len(df) for interval, df in frames.items() if len(df) < min_bars(sensitivity)}
+
+def detect_timeframes(frames, sensitivity=1.0):
+    """
+    Runs detect_patterns on every timeframe. Timeframes with fewer than
+    min_bars(sensitivity) bars are skipped with a warning (see short_timeframes).
+    Returns {interval: patterns}.
+    """
+    short = short_timeframes(frames, sensitivity)
+    for interval, n_bars in short.items():
+        logger.warning(f"Skipping {interval}: {n_bars} bars, fewer than the {min_bars(sensitivity)} "
+                       f"needed at sensitivity {sensitivity}. Use a longer period.")
+    return {interval: detect_patterns(df, sensitivity) for interval, df in frames.items() if interval not in short}
+
+def detection_matrix(detections):
+    """Returns a boolean pattern-by-timeframe DataFrame of detections."""
+    return pd.DataFrame({interval: [patterns[name]['detected'] for name in PATTERN_NAMES]
+                         for interval, patterns in detections.items()}, index=PATTERN_NAMES)
+
+def pattern_span(df, interval, points):
+    """Returns the (start, end) time a pattern covers: from its first point's bar to the end of its last point's bar."""
+    return df.index[min(points)], df.index[max(points)] + INTERVAL_TIMEDELTAS[interval]
+
+def aligned_timeframes(spans, tolerance):
+    """
+    Returns the largest group of timeframes whose pattern spans all overlap,
+    treating spans closer than tolerance as overlapping. spans maps interval
+    to (start, end); ties go to the group ending latest.
+    """
+    best, best_key = [], None
+    # Spans that overlap pairwise share a point, and some span's start is such a point
+    for point, _ in spans.values():
+        group = [interval for interval, (start, end) in spans.items() if start <= point <= end + tolerance]
+        key = (len(group), max(spans[interval][1] for interval in group))
+        if best_key is None or key > best_key:
+            best, best_key = group, key
+    return best
+
+def timeframe_confluence(frames, detections, min_timeframes=2, tolerance=None):
+    """
+    Lists patterns detected on at least min_timeframes timeframes, most
+    confirmed first, with the time of the latest pattern point on any of them.
+    A timeframe only counts when its pattern covers the same stretch of time
+    as the others (see aligned_timeframes); by default spans may be up to one
+    bar of the coarsest timeframe apart.
+    """
+    rows = []
+    for name in PATTERN_NAMES:
+        hits = [interval for interval, patterns in detections.items() if patterns[name]['detected']]
+        if len(hits) < min_timeframes:
+            continue
+        spans = {interval: pattern_span(frames[interval], interval, detections[interval][name]['points'])
+                 for interval in hits}
+        gap = tolerance if tolerance is not None else max(INTERVAL_TIMEDELTAS[interval] for interval in hits)
+        hits = sort_timeframes(aligned_timeframes(spans, gap))
+        if len(hits) < min_timeframes:
+            continue
+        latest = max(frames[interval].index[max(detections[interval][name]['points'])] for interval in hits)
+        rows.append({"Pattern": name, "Action": PATTERN_ACTIONS[name], "Timeframes": ", ".join(hits),
+                     "Timeframe Count": len(hits), "Latest Signal": latest})
+    confluence = pd.DataFrame(rows, columns=CONFLUENCE_COLUMNS)
+    return confluence.sort_values(["Timeframe Count", "Latest Signal"], ascending=False).reset_index(drop=True)
+
+def analyze_timeframes(ticker, period, api_key, intervals=DEFAULT_TIMEFRAMES, sensitivity=1.0, min_timeframes=2,
+                       cache=None, tolerance=None):
+    """
+    Fetches one base series (plus native daily bars when the period is longer
+    than intraday history), derives all timeframes and detects patterns on
+    each one that is long enough. Skipped timeframes are missing from the
+    detections.
+    Returns (frames, detections, confluence DataFrame, error).
+    """
+    frames, error = fetch_timeframes(ticker, period, api_key, intervals, cache=cache)
+    if error:
+        return {}, {}, pd.DataFrame(columns=CONFLUENCE_COLUMNS), error
+    detections = detect_timeframes(frames, sensitivity)
+    return frames, detections, timeframe_confluence(frames, detections, min_timeframes, tolerance), None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect chart patterns across timeframes derived from one fetch.")
+    parser.add_argument("ticker", help="Ticker to analyze (e.g., AAPL)")
+    parser.add_argument("--period", default="1mo", help="Data period (default: 1mo)")
+    parser.add_argument("--intervals", nargs="+", default=list(DEFAULT_TIMEFRAMES), choices=list(RESAMPLE_RULES),
+                        help="Timeframes to analyze; the finest one is fetched (default: 15m 1h 1d)")
+    parser.add_argument("--sensitivity", type=float, default=1.0, help="Pattern detection sensitivity")
+    parser.add_argument("--min-timeframes", type=int, default=2, help="Timeframes a pattern must appear on")
+    parser.add_argument("--tolerance", type=pd.Timedelta, default=None,
+                        help="How far apart pattern spans may be and still confirm each other, e.g. 2h "
+                             "(default: one bar of the coarsest timeframe)")
+    parser.add_argument("--api-key", default=os.environ.get("ALPHA_VANTAGE_KEY"), help="Alpha Vantage API key (default: $ALPHA_VANTAGE_KEY)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from bar_cache import BarCache
+    frames, detections, confluence, error = analyze_timeframes(
+        args.ticker, args.period, args.api_key, args.intervals, args.sensitivity, args.min_timeframes, BarCache(),
+        args.tolerance
+    )
+    if error:
+        logger.error(error)
+        return 1
+    for interval, df in frames.items():
+        logger.info(f"{interval}: {len(df)} bars" + ("" if interval in detections else " (too short, skipped)"))
+    print(detection_matrix(detections).to_string())
+    print()
+    print(confluence.to_string(index=False) if not confluence.empty else "No cross-timeframe confluence.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,40 @@
+import hashlib
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from scipy.signal import argrelextrema
+from instrumentation import count, timed, timer
+
+# Suggested action for each supported pattern (also fixes the reporting order)
+PATTERN_ACTIONS = {
+    "Double Top": "Sell",
+    "Double Bottom": "Buy",
+    "Head and Shoulders": "Sell",
+    "Flag": "Buy",
+    "Pennant": "Buy",
+    "Triangle": "Buy on breakout",
+    "Cup and Handle": "Buy"
+}
+
+PATTERN_NAMES = list(PATTERN_ACTIONS)
+# Largest number of points any pattern reports (Triangle)
+MAX_POINTS = 6
+# Record layout of enumerate_patterns results
+OCCURRENCE_DTYPE = np.dtype([
+    ("pattern", np.int8),
+    ("start", np.int64),
+    ("end", np.int64),
+    ("detected_at", np.int64),
+    ("points", np.int64, (MAX_POINTS,)),
+    ("score", np.float64)
+])
+
+# Bounded memo of pivot arrays keyed by (data fingerprint, window)
+PIVOT_CACHE_SIZE = 128
+_pivot_cache = OrderedDict()
+# Guards the memo; Streamlit sessions and the scan service detect from several threads
+_pivot_cache_lock = threading.Lock()
 
 def get_pattern_description(pattern):
     """Returns a description of the chart pattern."""
@@ -15,82 +49,226 @@ def get_pattern_description(pattern):
     }
     return descriptions.get(pattern, "No description available.")
 
-def detect_patterns(data, sensitivity=1.0):
+def get_window(sensitivity=1.0):
+    """Returns the extrema comparison window used for a given sensitivity."""
+    return int(20 / sensitivity)
+
+def empty_patterns():
+    """Returns the pattern result dictionary with nothing detected."""
+    return {name: {"detected": False, "points": [], "action": action} for name, action in PATTERN_ACTIONS.items()}
+
+def find_pivots(close, window):
     """
-    Detects chart patterns in the given OHLC data with adjustable sensitivity.
-    Returns a dictionary with pattern names, detection status, points, and suggested actions.
+    Finds local maxima and minima of a close price array.
+    A pivot at bar i is only confirmed once bar i + window is known.
     """
-    patterns = {
-        "Double Top": {"detected": False, "points": [], "action": "Sell"},
-        "Double Bottom": {"detected": False, "points": [], "action": "Buy"},
-        "Head and Shoulders": {"detected": False, "points": [], "action": "Sell"},
-        "Flag": {"detected": False, "points": [], "action": "Buy"},
-        "Pennant": {"detected": False, "points": [], "action": "Buy"},
-        "Triangle": {"detected": False, "points": [], "action": "Buy on breakout"},
-        "Cup and Handle": {"detected": False, "points": [], "action": "Buy"}
-    }
-    
-    close = data['Close'].values
-    window = int(20 / sensitivity)  # Adjust window based on sensitivity
-    
-    # Find local maxima and minima
-    maxima = argrelextrema(close, np.greater, order=window)[0]
-    minima = argrelextrema(close, np.less, order=window)[0]
-    
-    # Double Top Detection
+    with timer("extrema"):
+        maxima = argrelextrema(close, np.greater, order=window)[0]
+        minima = argrelextrema(close, np.less, order=window)[0]
+    return maxima, minima
+
+def data_fingerprint(close):
+    """Returns a content hash of a close price array, used as a memo key."""
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    return hashlib.blake2b(close.view(np.uint8), digest_size=16).hexdigest()
+
+def cached_pivots(close, window, fingerprint=None):
+    """
+    Same as find_pivots, but memoized on the data fingerprint and window.
+    Many sensitivities share a window, so repeated calls reuse the extrema.
+    The returned arrays are read-only.
+    """
+    key = (fingerprint or data_fingerprint(close), window)
+    with _pivot_cache_lock:
+        pivots = _pivot_cache.get(key)
+        if pivots is not None:
+            _pivot_cache.move_to_end(key)
+    if pivots is not None:
+        count("pivot_cache.hit")
+        return pivots
+    count("pivot_cache.miss")
+    pivots = find_pivots(close, window)
+    for arr in pivots:
+        arr.setflags(write=False)
+    with _pivot_cache_lock:
+        _pivot_cache[key] = pivots
+        if len(_pivot_cache) > PIVOT_CACHE_SIZE:
+            _pivot_cache.popitem(last=False)
+    return pivots
+
+def clear_pivot_cache():
+    """Empties the pivot memo."""
+    with _pivot_cache_lock:
+        _pivot_cache.clear()
+
+# Pattern rules. Each rule looks at the confirmed pivots (indices plus their
+# close prices, oldest first) and returns (points, score), or None. The score
+# is in [0, 1]; higher means the rule's condition is met by a wider margin.
+
+def _margin(value, limit):
+    return float(min(1.0, max(0.0, 1 - value / limit)))
+
+def _double_top(maxima, minima, max_close, min_close, sensitivity):
     if len(maxima) >= 2:
-        last_two_maxima = maxima[-2:]
         threshold = 0.02 * sensitivity
-        if abs(close[last_two_maxima[0]] - close[last_two_maxima[1]]) < threshold * close[last_two_maxima[0]]:
-            patterns["Double Top"]["detected"] = True
-            patterns["Double Top"]["points"] = list(last_two_maxima)
-    
-    # Double Bottom Detection
+        diff = abs(max_close[-2] - max_close[-1])
+        if diff < threshold * max_close[-2]:
+            return list(maxima[-2:]), _margin(diff, threshold * max_close[-2])
+    return None
+
+def _double_bottom(maxima, minima, max_close, min_close, sensitivity):
     if len(minima) >= 2:
-        last_two_minima = minima[-2:]
-        if abs(close[last_two_minima[0]] - close[last_two_minima[1]]) < threshold * close[last_two_minima[0]]:
-            patterns["Double Bottom"]["detected"] = True
-            patterns["Double Bottom"]["points"] = list(last_two_minima)
-    
-    # Head and Shoulders Detection (simplified)
+        threshold = 0.02 * sensitivity
+        diff = abs(min_close[-2] - min_close[-1])
+        if diff < threshold * min_close[-2]:
+            return list(minima[-2:]), _margin(diff, threshold * min_close[-2])
+    return None
+
+def _head_and_shoulders(maxima, minima, max_close, min_close, sensitivity):
     if len(maxima) >= 3 and len(minima) >= 2:
-        last_three_maxima = maxima[-3:]
-        last_two_minima = minima[-2:]
-        if (close[last_three_maxima[1]] > close[last_three_maxima[0]] and 
-            close[last_three_maxima[1]] > close[last_three_maxima[2]] and
-            abs(close[last_three_maxima[0]] - close[last_three_maxima[2]]) < threshold * close[last_three_maxima[1]]):
-            patterns["Head and Shoulders"]["detected"] = True
-            patterns["Head and Shoulders"]["points"] = list(last_three_maxima) + list(last_two_minima)
-    
-    # Flag Detection (simplified)
+        threshold = 0.02 * sensitivity
+        diff = abs(max_close[-3] - max_close[-1])
+        if (max_close[-2] > max_close[-3] and
+            max_close[-2] > max_close[-1] and
+            diff < threshold * max_close[-2]):
+            return list(maxima[-3:]) + list(minima[-2:]), _margin(diff, threshold * max_close[-2])
+    return None
+
+def _flag(maxima, minima, max_close, min_close, sensitivity):
     if len(maxima) > 1 and len(minima) > 1:
-        recent_max = maxima[-1]
-        recent_min = minima[-1]
-        if recent_max > recent_min and close[recent_max] - close[recent_min] < 0.05 * sensitivity * close[recent_max]:
-            patterns["Flag"]["detected"] = True
-            patterns["Flag"]["points"] = [recent_min, recent_max]
-    
-    # Pennant Detection (simplified)
+        limit = 0.05 * sensitivity * max_close[-1]
+        if maxima[-1] > minima[-1] and max_close[-1] - min_close[-1] < limit:
+            return [minima[-1], maxima[-1]], _margin(max_close[-1] - min_close[-1], limit)
+    return None
+
+def _pennant(maxima, minima, max_close, min_close, sensitivity):
     if len(maxima) > 2 and len(minima) > 2:
-        if (close[maxima[-1]] - close[minima[-1]] < 0.03 * sensitivity * close[maxima[-1]] and
-            close[maxima[-2]] - close[minima[-2]] > 0.05 * sensitivity * close[maxima[-2]]):
-            patterns["Pennant"]["detected"] = True
-            patterns["Pennant"]["points"] = [minima[-2], maxima[-2], minima[-1], maxima[-1]]
-    
-    # Triangle Detection (simplified)
+        limit = 0.03 * sensitivity * max_close[-1]
+        if (max_close[-1] - min_close[-1] < limit and
+            max_close[-2] - min_close[-2] > 0.05 * sensitivity * max_close[-2]):
+            return [minima[-2], maxima[-2], minima[-1], maxima[-1]], _margin(max_close[-1] - min_close[-1], limit)
+    return None
+
+def _triangle(maxima, minima, max_close, min_close, sensitivity):
     if len(maxima) > 2 and len(minima) > 2:
-        highs = close[maxima[-3:]]
-        lows = close[minima[-3:]]
-        if np.std(highs) < 0.02 * sensitivity * np.mean(highs) and np.std(lows) < 0.02 * sensitivity * np.mean(lows):
-            patterns["Triangle"]["detected"] = True
-            patterns["Triangle"]["points"] = list(maxima[-3:]) + list(minima[-3:])
-    
-    # Cup and Handle Detection (simplified)
-    if len(minima) > 3:
-        cup_min = minima[-4]
-        handle_min = minima[-1]
-        if close[cup_min] < close[handle_min] and close[maxima[-1]] > close[maxima[-2]]:
-            patterns["Cup and Handle"]["detected"] = True
-            patterns["Cup and Handle"]["points"] = [cup_min, maxima[-2], handle_min, maxima[-1]]
-    
-    return patterns
\ No newline at end of file
+        highs = max_close[-3:]
+        lows = min_close[-3:]
+        high_limit = 0.02 * sensitivity * np.mean(highs)
+        low_limit = 0.02 * sensitivity * np.mean(lows)
+        if np.std(highs) < high_limit and np.std(lows) < low_limit:
+            score = min(_margin(np.std(highs), high_limit), _margin(np.std(lows), low_limit))
+            return list(maxima[-3:]) + list(minima[-3:]), score
+    return None
+
+def _cup_and_handle(maxima, minima, max_close, min_close, sensitivity):
+    if len(minima) > 3 and len(maxima) > 1:
+        if min_close[-4] < min_close[-1] and max_close[-1] > max_close[-2]:
+            # Breakout above the cup rim relative to the cup depth
+            score = 1 - _margin(max_close[-1] - max_close[-2], max_close[-1] - min_close[-4])
+            return [minima[-4], maxima[-2], minima[-1], maxima[-1]], score
+    return None
+
+PATTERN_RULES = {
+    "Double Top": _double_top,
+    "Double Bottom": _double_bottom,
+    "Head and Shoulders": _head_and_shoulders,
+    "Flag": _flag,
+    "Pennant": _pennant,
+    "Triangle": _triangle,
+    "Cup and Handle": _cup_and_handle
+}
+
+# Pivot kinds each rule reads; a new pivot of one kind can only change these rules
+PATTERN_PIVOTS = {
+    "Double Top": ("max",),
+    "Double Bottom": ("min",),
+    "Head and Shoulders": ("max", "min"),
+    "Flag": ("max", "min"),
+    "Pennant": ("max", "min"),
+    "Triangle": ("max", "min"),
+    "Cup and Handle": ("max", "min")
+}
+
+def evaluate_patterns(maxima, minima, max_close, min_close, sensitivity=1.0):
+    """
+    Applies every pattern rule to a set of confirmed pivots.
+    Returns the same dictionary shape as detect_patterns.
+    """
+    patterns = empty_patterns()
+    for name, rule in PATTERN_RULES.items():
+        with timer(f"rule.{name}"):
+            match = rule(maxima, minima, max_close, min_close, sensitivity)
+        if match is not None:
+            patterns[name]["detected"] = True
+            patterns[name]["points"] = match[0]
+    return patterns
+
+def iter_pivot_states(maxima, minima, window, n_bars, stride=1, start=0):
+    """
+    Walks forward over bars start, start + stride, ... < n_bars and yields
+    (bar, n_maxima, n_minima) for the first bar and whenever the set of
+    confirmed pivots changes. Only pivots whose confirmation bar
+    (pivot + window) has been reached are counted, so no state depends on
+    bars after the yielded bar. Costs O(pivots), not O(bars).
+    """
+    if stride < 1:
+        raise ValueError(f"stride must be at least 1, got {stride}.")
+    if start >= n_bars:
+        return
+    # Each confirmation takes effect at the first walk step on or after it
+    confirmed_at = np.concatenate([maxima, minima]) + window
+    confirmed_at = confirmed_at[confirmed_at > start]
+    steps = start + -(-(confirmed_at - start) // stride) * stride
+    steps = np.unique(np.concatenate([[start], steps]))
+    steps = steps[steps < n_bars]
+    max_counts = np.searchsorted(maxima + window, steps, side="right")
+    min_counts = np.searchsorted(minima + window, steps, side="right")
+    for bar, n_max, n_min in zip(steps, max_counts, min_counts):
+        yield int(bar), int(n_max), int(n_min)
+
+def enumerate_patterns(data, sensitivity=1.0, stride=1, start=0):
+    """
+    Enumerates every historical pattern occurrence in one pass over the pivot sequence.
+    Walks forward like iter_pivot_states and applies the rules to each
+    growing pivot window; an occurrence is recorded at the bar where its
+    pivots are first all confirmed. Returns a structured array of
+    OCCURRENCE_DTYPE records (pattern is an index into PATTERN_NAMES; points
+    are padded with -1), in detection order.
+    """
+    close = np.asarray(data['Close'], dtype=np.float64)
+    window = get_window(sensitivity)
+    maxima, minima = cached_pivots(close, window)
+    max_close = close[maxima]
+    min_close = close[minima]
+
+    records = []
+    last_points = {}
+    for bar, n_max, n_min in iter_pivot_states(maxima, minima, window, len(close), stride, start):
+        for pattern_id, (name, rule) in enumerate(PATTERN_RULES.items()):
+            match = rule(maxima[:n_max], minima[:n_min], max_close[:n_max], min_close[:n_min], sensitivity)
+            if match is None:
+                continue
+            points = tuple(int(p) for p in match[0])
+            # The same pivots keep matching until a new pivot arrives; record them once
+            if last_points.get(name) == points:
+                continue
+            last_points[name] = points
+            padded = points + (-1,) * (MAX_POINTS - len(points))
+            records.append((pattern_id, min(points), max(points), bar, padded, match[1]))
+
+    return np.array(records, dtype=OCCURRENCE_DTYPE)
+
+@timed("detect")
+def detect_patterns(data, sensitivity=1.0):
+    """
+    Detects chart patterns in the given OHLC data with adjustable sensitivity.
+    data may be a DataFrame or anything indexable by 'Close', such as a BarView.
+    Returns a dictionary with pattern names, detection status, points, and suggested actions.
+    """
+    close = np.asarray(data['Close'], dtype=np.float64)
+    window = get_window(sensitivity)  # Adjust window based on sensitivity
+
+    # Find local maxima and minima (memoized across reruns with the same data)
+    maxima, minima = cached_pivots(close, window)
+
+    return evaluate_patterns(maxima, minima, close[maxima], close[minima], sensitivity)
@@ -0,0 +1,321 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from backtester import backtest_patterns
+from data_fetcher import INTERVAL_TIMEDELTAS, fetch_alpha_vantage_data
+import instrumentation
+from pattern_detector import PATTERN_ACTIONS, detect_patterns
+from synthetic_data import generate_ohlcv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+def alpha_vantage_source(api_key, cache=None):
+    """Returns a data source that fetches from Alpha Vantage (optionally through a BarCache)."""
+    def fetch(ticker, period, interval):
+        return fetch_alpha_vantage_data(ticker=ticker, period=period, interval=interval, api_key=api_key, cache=cache)
+    return fetch
+
+def synthetic_source(n_bars=500):
+    """Returns a stub data source that serves reproducible synthetic bars per ticker, for offline use."""
+    def fetch(ticker, period, interval):
+        end = datetime.now().replace(second=0, microsecond=0)
+        start = end - INTERVAL_TIMEDELTAS.get(interval, INTERVAL_TIMEDELTAS["1d"]) * (n_bars - 1)
+        freq = {"1m": "1min", "5m": "5min", "15m": "15min", "1h": "1h"}.get(interval, "1D")
+        return generate_ohlcv(n_bars, seed=zlib.crc32(ticker.encode()), start=start, freq=freq), None
+    return fetch
+
+def _to_json_value(value):
+    """Converts NumPy scalars and timestamps into JSON-friendly values."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+class ScanService:
+    """
+    Owns the fetch/detect/backtest pipeline for a set of symbols.
+    A background thread refreshes every symbol each refresh_seconds; readers
+    get the latest snapshot without triggering any computation. Refreshes
+    requested over HTTP are queued for that thread instead of running on the
+    request thread.
+    The data source is any callable (ticker, period, interval) -> (df, error).
+    """
+
+    def __init__(self, symbols, source, period="5d", interval="15m", sensitivity=1.0, look_forward=10,
+                 refresh_seconds=60):
+        self.symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        self.source = source
+        self.period = period
+        self.interval = interval
+        self.sensitivity = sensitivity
+        self.look_forward = look_forward
+        self.refresh_seconds = refresh_seconds
+        self.last_refresh = None
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._pending = {}  # queued symbols in request order; None means all
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def refresh_symbol(self, symbol):
+        """Runs the pipeline for one symbol and stores its snapshot."""
+        start = time.perf_counter()
+        snapshot = {"symbol": symbol, "period": self.period, "interval": self.interval,
+                    "sensitivity": self.sensitivity, "look_forward": self.look_forward, "error": None,
+                    "bars": 0, "last_bar": None, "patterns": {}, "backtest": {}}
+        try:
+            data, error = self.source(symbol, self.period, self.interval)
+            if error:
+                snapshot["error"] = error
+            elif data.empty:
+                snapshot["error"] = f"No data fetched for {symbol}."
+            else:
+                patterns = detect_patterns(data, self.sensitivity)
+                backtest = backtest_patterns(data, PATTERN_ACTIONS, self.look_forward, sensitivity=self.sensitivity)
+                snapshot["bars"] = len(data)
+                snapshot["last_bar"] = _to_json_value(data.index[-1])
+                snapshot["patterns"] = {
+                    pattern: {
+                        "detected": info["detected"],
+                        "action": info["action"],
+                        "points": [int(p) for p in info["points"]],
+                        "times": [_to_json_value(data.index[p]) for p in info["points"]]
+                    }
+                    for pattern, info in patterns.items()
+                }
+                snapshot["backtest"] = {pattern: {key: _to_json_value(value) for key, value in stats.items()}
+                                        for pattern, stats in backtest.items()}
+        except Exception as e:
+            logger.error(f"Error refreshing {symbol}: {str(e)}")
+            snapshot["error"] = str(e)
+
+        snapshot["updated_at"] = datetime.now(timezone.utc).isoformat()
+        snapshot["seconds"] = time.perf_counter() - start
+        with self._lock:
+            self._snapshots[symbol] = snapshot
+        return snapshot
+
+    def refresh_all(self):
+        """Refreshes every symbol once."""
+        for symbol in list(self.symbols):
+            if self._stop.is_set():
+                break
+            self.refresh_symbol(symbol)
+        self.last_refresh = datetime.now(timezone.utc).isoformat()
+
+    def add_symbol(self, symbol):
+        """Adds a symbol to the schedule and queues its first snapshot. Returns the symbol."""
+        symbol = symbol.upper()
+        with self._lock:
+            if symbol not in self.symbols:
+                self.symbols.append(symbol)
+        self.request_refresh(symbol)
+        return symbol
+
+    def snapshot(self, symbol):
+        """Returns the latest snapshot for a symbol, or None."""
+        with self._lock:
+            return self._snapshots.get(symbol.upper())
+
+    def snapshots(self):
+        """Returns the latest snapshots of all symbols."""
+        with self._lock:
+            return list(self._snapshots.values())
+
+    def request_refresh(self, symbol=None):
+        """
+        Queues a refresh of one symbol, or of all symbols, and returns at once.
+        The scheduler thread picks it up; if it is not started, a background
+        thread runs the queue instead.
+        """
+        with self._lock:
+            self._pending[symbol.upper() if symbol else None] = True
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+        else:
+            threading.Thread(target=self._run_pending, daemon=True).start()
+
+    def _run_pending(self):
+        """Runs queued refreshes until the queue is empty."""
+        while not self._stop.is_set():
+            with self._lock:
+                if not self._pending:
+                    return
+                symbol = next(iter(self._pending))
+                del self._pending[symbol]
+            if symbol is None:
+                self.refresh_all()
+            else:
+                self.refresh_symbol(symbol)
+
+    def _run(self):
+        next_full = time.monotonic()
+        while not self._stop.is_set():
+            # Clear before working so requests arriving meanwhile wake the next wait
+            self._wake.clear()
+            if time.monotonic() >= next_full:
+                self.refresh_all()
+                next_full = time.monotonic() + self.refresh_seconds
+            self._run_pending()
+            self._wake.wait(max(0.0, next_full - time.monotonic()))
+
+    def start(self):
+        """Starts the background refresh thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="scan-service", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background refresh thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+BACKTEST_FIELDS = ("symbol", "updated_at", "error", "bars", "look_forward", "backtest")
+
+def _select(snapshot, fields):
+    return snapshot if fields is None else {key: snapshot[key] for key in fields}
+
+def make_handler(service):
+    """Builds the HTTP request handler serving a ScanService."""
+
+    class ScanRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_text(self, text, content_type="text/plain; version=0.0.4"):
+            body = text.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            symbol = parts[1] if len(parts) > 1 else parse_qs(url.query).get("symbol", [None])[0]
+            return (parts[0] if parts else ""), symbol
+
+        def do_GET(self):
+            route, symbol = self._route()
+            if route == "health":
+                self._send_json({"status": "ok", "symbols": len(service.symbols), "last_refresh": service.last_refresh})
+            elif route == "symbols":
+                self._send_json({"symbols": service.symbols})
+            elif route == "metrics":
+                # Prometheus text format; empty unless metrics collection is enabled
+                self._send_text(instrumentation.REGISTRY.to_prometheus())
+            elif route in ("detections", "backtest"):
+                # Backtest responses leave out the pattern details
+                fields = BACKTEST_FIELDS if route == "backtest" else None
+                if not symbol:
+                    self._send_json({"results": [_select(s, fields) for s in service.snapshots()]})
+                    return
+                snapshot = service.snapshot(symbol)
+                if snapshot is None:
+                    self._send_json({"error": f"Unknown symbol {symbol}."}, status=404)
+                else:
+                    self._send_json(_select(snapshot, fields))
+            else:
+                self._send_json({"error": "Not found."}, status=404)
+
+        def do_POST(self):
+            route, symbol = self._route()
+            # Work is queued for the scheduler; clients poll /detections for the result
+            if route == "symbols" and symbol:
+                self._send_json({"status": "queued", "symbol": service.add_symbol(symbol)}, status=202)
+            elif route == "refresh":
+                service.request_refresh(symbol)
+                self._send_json({"status": "queued", "symbol": symbol.upper() if symbol else None}, status=202)
+            else:
+                self._send_json({"error": "Not found."}, status=404)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ScanRequestHandler
+
+def serve(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Starts the service's scheduler and returns a running HTTP server (call shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    service.start()
+    threading.Thread(target=server.serve_forever, name="scan-http", daemon=True).start()
+    logger.info(f"Scan service listening on http://{host}:{server.server_port}")
+    return server
+
+def get_detections(base_url, symbol, timeout=10):
+    """Thin-client helper: returns the latest snapshot for a symbol from a running service."""
+    response = requests.get(f"{base_url.rstrip('/')}/detections/{symbol}", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def get_backtest(base_url, symbol, timeout=10):
+    """Thin-client helper: returns the latest backtest results for a symbol from a running service."""
+    response = requests.get(f"{base_url.rstrip('/')}/backtest/{symbol}", timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the headless pattern scan service.")
+    parser.add_argument("symbols", nargs="+", help="Tickers to keep up to date")
+    parser.add_argument("--period", default="5d", help="Data period (default: 5d)")
+    parser.add_argument("--interval", default="15m", help="Data interval (default: 15m)")
+    parser.add_argument("--sensitivity", type=float, default=1.0, help="Pattern detection sensitivity")
+    parser.add_argument("--look-forward", type=int, default=10, help="Backtest look-forward period")
+    parser.add_argument("--refresh", type=int, default=60, help="Seconds between refreshes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--api-key", default=os.environ.get("ALPHA_VANTAGE_KEY"), help="Alpha Vantage API key (default: $ALPHA_VANTAGE_KEY)")
+    parser.add_argument("--stub", action="store_true", help="Serve synthetic data instead of calling Alpha Vantage")
+    parser.add_argument("--metrics", action="store_true", help="Collect stage timings for the /metrics endpoint")
+    parser.add_argument("--log-metrics", action="store_true", help="Also write every measurement to the log")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics or args.log_metrics:
+        instrumentation.enable()
+    if args.log_metrics:
+        instrumentation.add_sink(instrumentation.LogSink())
+    if args.stub:
+        source = synthetic_source()
+    else:
+        from bar_cache import BarCache
+        source = alpha_vantage_source(args.api_key, BarCache())
+
+    service = ScanService(args.symbols, source, args.period, args.interval, args.sensitivity,
+                          args.look_forward, args.refresh)
+    server = serve(service, args.host, args.port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
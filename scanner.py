@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from pattern_detector import detect_patterns
+from async_fetcher import fetch_many
+from bar_store import BarStoreSource
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = ["Rank", "Symbol", "Pattern", "Action", "Signal Time", "Bars Since Signal", "Patterns Detected"]
+TIMING_COLUMNS = ["Symbol", "Bars", "Patterns Detected", "Fetch Seconds", "Detect Seconds", "Error"]
+
+def detect_symbol(symbol, data, error=None, sensitivity=1.0):
+    """
+    Runs pattern detection on one already fetched series.
+    Returns (pattern rows, timing row); the timing row has no fetch time.
+    """
+    start = time.perf_counter()
+    rows = []
+    if not error and not data.empty:
+        patterns = detect_patterns(data, sensitivity)
+        for pattern, info in patterns.items():
+            if info['detected']:
+                last_point = int(max(info['points']))
+                rows.append({
+                    "Symbol": symbol,
+                    "Pattern": pattern,
+                    "Action": info['action'],
+                    "Signal Time": data.index[last_point],
+                    "Bars Since Signal": len(data) - 1 - last_point
+                })
+    elif not error:
+        error = f"No data fetched for {symbol}."
+
+    timing = {
+        "Symbol": symbol,
+        "Bars": len(data),
+        "Patterns Detected": len(rows),
+        "Fetch Seconds": float("nan"),
+        "Detect Seconds": time.perf_counter() - start,
+        "Error": error
+    }
+    return rows, timing
+
+def _fetch_one(fetcher, symbol, period, interval, api_key):
+    try:
+        return fetcher(ticker=symbol, period=period, interval=interval, api_key=api_key)
+    except Exception as e:
+        return pd.DataFrame(), f"Error fetching {symbol}: {str(e)}"
+
+def _scan_chunk(units, period, interval, sensitivity, source):
+    """
+    Process-pool work unit: detects patterns for a chunk of
+    (symbol, data, error, fetch seconds) tuples. With a local source (a bar
+    store), data is None and the worker reads the bars itself.
+    """
+    results = []
+    for symbol, data, error, fetch_seconds in units:
+        if source is not None:
+            start = time.perf_counter()
+            data, error = _fetch_one(source, symbol, period, interval, None)
+            fetch_seconds = time.perf_counter() - start
+        rows, timing = detect_symbol(symbol, data, error, sensitivity)
+        timing["Fetch Seconds"] = fetch_seconds
+        results.append((rows, timing))
+    return results
+
+def fetch_universe(symbols, period, interval, api_key, fetcher=None, calls_per_minute=5, max_concurrency=8,
+                   progress=None):
+    """
+    Fetches every symbol in the calling process.
+    Without a fetcher, requests go through fetch_many, so all of them share one
+    token bucket sized to the API quota. A fetcher with the
+    fetch_alpha_vantage_data signature is called once per symbol.
+    progress, if given, is called as progress(done, total) after every fetch.
+    Returns {symbol: (df, error, fetch seconds)}.
+    """
+    if fetcher is None:
+        return fetch_many(symbols, period, interval, api_key, calls_per_minute, max_concurrency, progress=progress)
+    results = {}
+    for symbol in symbols:
+        start = time.perf_counter()
+        df, error = _fetch_one(fetcher, symbol, period, interval, api_key)
+        results[symbol] = (df, error, time.perf_counter() - start)
+        if progress:
+            progress(len(results), len(symbols))
+    return results
+
+def rank_results(rows):
+    """
+    Ranks symbols by number of detected patterns, then by how recent their latest signal is.
+    Returns a DataFrame with one row per detected pattern.
+    """
+    results = pd.DataFrame(rows, columns=[c for c in RESULT_COLUMNS if c not in ("Rank", "Patterns Detected")])
+    if results.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    grouped = results.groupby("Symbol")
+    results["Patterns Detected"] = grouped["Pattern"].transform("size")
+    freshest = grouped["Bars Since Signal"].transform("min")
+    results = results.assign(_freshest=freshest).sort_values(
+        ["Patterns Detected", "_freshest", "Symbol", "Bars Since Signal"],
+        ascending=[False, True, True, True]
+    )
+    results["Rank"] = pd.factorize(results["Symbol"])[0] + 1
+    return results[RESULT_COLUMNS].reset_index(drop=True)
+
+def scan_universe(symbols, period, interval, api_key, sensitivity=1.0, max_workers=None,
+                  chunk_size=25, fetcher=None, progress=None, store=None, calls_per_minute=5):
+    """
+    Runs pattern detection over many symbols on a process pool.
+    Bars are fetched in this process first (see fetch_universe), so the API
+    rate limit is respected once rather than per worker; only detection is
+    sent to the pool. With store (a bar store path), workers map the stored
+    bars themselves and nothing is fetched.
+    Symbols are split into chunks of chunk_size per work unit. progress, if
+    given, is called as progress(stage, done, total): with stage "fetch" after
+    every fetched symbol, then with stage "detect" after every finished chunk.
+    Returns (ranked pattern DataFrame, per-symbol timing DataFrame).
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if store is not None:
+        source = BarStoreSource(store)
+        units = [(symbol, None, None, float("nan")) for symbol in symbols]
+    else:
+        source = None
+        fetch_progress = (lambda done, total: progress("fetch", done, total)) if progress else None
+        fetched = fetch_universe(symbols, period, interval, api_key, fetcher, calls_per_minute, progress=fetch_progress)
+        units = [(symbol,) + fetched[symbol] for symbol in symbols]
+    chunks = [units[i:i + chunk_size] for i in range(0, len(units), chunk_size)]
+    rows, timings = [], []
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_scan_chunk, chunk, period, interval, sensitivity, source): chunk
+                   for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                logger.error(f"Scan worker failed for {len(chunk)} symbols: {str(e)}")
+                chunk_results = [([], {"Symbol": unit[0], "Bars": 0, "Patterns Detected": 0, "Fetch Seconds": unit[3],
+                                       "Detect Seconds": 0.0, "Error": str(e)}) for unit in chunk]
+            for symbol_rows, timing in chunk_results:
+                rows.extend(symbol_rows)
+                timings.append(timing)
+            done += len(chunk)
+            if progress:
+                progress("detect", done, len(symbols))
+
+    timing_df = pd.DataFrame(timings, columns=TIMING_COLUMNS).sort_values("Symbol").reset_index(drop=True)
+    return rank_results(rows), timing_df
+
+def _read_symbols(args):
+    symbols = list(args.symbols or [])
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols.extend(line.split(",")[0] for line in f if line.strip() and not line.startswith("#"))
+    return symbols
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a universe of tickers for chart patterns.")
+    parser.add_argument("symbols", nargs="*", help="Tickers to scan (e.g., AAPL RELIANCE.NS)")
+    parser.add_argument("--symbols-file", help="File with one ticker per line (first CSV column is used)")
+    parser.add_argument("--period", default="3mo", help="Data period (default: 3mo)")
+    parser.add_argument("--interval", default="1d", help="Data interval (default: 1d)")
+    parser.add_argument("--sensitivity", type=float, default=1.0, help="Pattern detection sensitivity (0.5 to 2.0)")
+    parser.add_argument("--api-key", default=os.environ.get("ALPHA_VANTAGE_KEY"), help="Alpha Vantage API key (default: $ALPHA_VANTAGE_KEY)")
+    parser.add_argument("--store", help="Read bars from this bar store instead of Alpha Vantage")
+    parser.add_argument("--calls-per-minute", type=int, default=5, help="Alpha Vantage request quota shared by all fetches")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=25, help="Symbols per work unit")
+    parser.add_argument("--output", help="Write ranked patterns to this CSV file")
+    parser.add_argument("--timings", help="Write per-symbol timings to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    symbols = _read_symbols(args)
+    if not symbols:
+        parser.error("no symbols given")
+
+    start = time.perf_counter()
+    results, timings = scan_universe(
+        symbols, args.period, args.interval, args.api_key, args.sensitivity,
+        max_workers=args.workers, chunk_size=args.chunk_size,
+        store=args.store, calls_per_minute=args.calls_per_minute,
+        progress=lambda stage, done, total: logger.info(f"{'Fetched' if stage == 'fetch' else 'Scanned'} {done}/{total} symbols")
+    )
+    logger.info(f"Scanned {len(timings)} symbols in {time.perf_counter() - start:.1f}s "
+                f"({timings['Error'].notna().sum()} errors)")
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+    else:
+        results.to_csv(sys.stdout, index=False)
+    if args.timings:
+        timings.to_csv(args.timings, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
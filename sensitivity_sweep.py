@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from pattern_detector import PATTERN_ACTIONS, cached_pivots, data_fingerprint, evaluate_patterns, get_window
+
+# Same grid as the sensitivity slider in app.py
+DEFAULT_SENSITIVITIES = np.round(np.arange(0.5, 2.0 + 1e-9, 0.1), 1)
+
+def sweep_sensitivity(data, sensitivities=DEFAULT_SENSITIVITIES):
+    """
+    Runs pattern detection for a grid of sensitivities in one call.
+    Extrema are computed once per distinct window and shared through the pivot memo.
+    Returns a DataFrame indexed by sensitivity with the window and one boolean column per pattern.
+    """
+    close = np.asarray(data['Close'], dtype=np.float64)
+    fingerprint = data_fingerprint(close)
+    sensitivities = sorted(set(float(s) for s in sensitivities))
+
+    rows = []
+    for sensitivity in sensitivities:
+        window = get_window(sensitivity)
+        maxima, minima = cached_pivots(close, window, fingerprint)
+        patterns = evaluate_patterns(maxima, minima, close[maxima], close[minima], sensitivity)
+        row = {"Sensitivity": sensitivity, "Window": window}
+        row.update({pattern: info["detected"] for pattern, info in patterns.items()})
+        rows.append(row)
+
+    return pd.DataFrame(rows, columns=["Sensitivity", "Window"] + list(PATTERN_ACTIONS)).set_index("Sensitivity")
+
+def detection_stability(sweep):
+    """
+    Summarizes how stable each pattern's detection is across a sensitivity sweep.
+    Returns a DataFrame with the fraction of the grid where the pattern is detected,
+    the number of on/off flips between neighbouring grid points, and the
+    lowest and highest sensitivity that detects it.
+    """
+    rows = []
+    for pattern in PATTERN_ACTIONS:
+        hits = sweep[pattern].to_numpy(dtype=bool)
+        detected_at = sweep.index[hits]
+        rows.append({
+            "Pattern": pattern,
+            "Detection Rate": hits.mean() if len(hits) else 0.0,
+            "Flips": int(np.count_nonzero(hits[1:] != hits[:-1])),
+            "Min Sensitivity": detected_at.min() if len(detected_at) else np.nan,
+            "Max Sensitivity": detected_at.max() if len(detected_at) else np.nan
+        })
+    return pd.DataFrame(rows).set_index("Pattern")
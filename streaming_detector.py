@@ -0,0 +1,96 @@
+from collections import deque
+import numpy as np
+from pattern_detector import PATTERN_PIVOTS, PATTERN_RULES, empty_patterns, find_pivots, get_window
+
+# Rules never look further back than the last four pivots of a kind
+PIVOT_HISTORY = 8
+
+class StreamingPatternDetector:
+    """
+    Stateful pattern detector that is fed one OHLC bar at a time.
+    Keeps the last 2 * window + 1 closes in a ring buffer and a short list of
+    confirmed pivots, so each update costs O(window) instead of O(history).
+    Results use the same dictionary shape as detect_patterns; points are bar
+    numbers counted from the first bar fed to the detector. Only confirmed
+    pivots are used, so results match the walk-forward state of the series.
+    """
+
+    def __init__(self, sensitivity=1.0):
+        self.sensitivity = sensitivity
+        self.window = get_window(sensitivity)
+        self.reset()
+
+    def reset(self):
+        """Clears all bars and pivots."""
+        self.bar_count = 0
+        self._closes = deque(maxlen=2 * self.window + 1)
+        self._maxima = deque(maxlen=PIVOT_HISTORY)
+        self._minima = deque(maxlen=PIVOT_HISTORY)
+        self._max_close = deque(maxlen=PIVOT_HISTORY)
+        self._min_close = deque(maxlen=PIVOT_HISTORY)
+        self.patterns = empty_patterns()
+
+    def warm_up(self, data):
+        """
+        Seeds the detector from a historical OHLC DataFrame in one vectorized pass.
+        Returns the current pattern dictionary.
+        """
+        close = np.asarray(data['Close'], dtype=np.float64)
+        if len(close) == 0:
+            return self.patterns
+        self.reset()
+        maxima, minima = find_pivots(close, self.window)
+        last_bar = len(close) - 1
+        maxima = maxima[maxima + self.window <= last_bar]
+        minima = minima[minima + self.window <= last_bar]
+        self._maxima.extend(int(i) for i in maxima[-PIVOT_HISTORY:])
+        self._max_close.extend(close[maxima[-PIVOT_HISTORY:]])
+        self._minima.extend(int(i) for i in minima[-PIVOT_HISTORY:])
+        self._min_close.extend(close[minima[-PIVOT_HISTORY:]])
+        self._closes.extend(close[-self._closes.maxlen:])
+        self.bar_count = len(close)
+        self._evaluate(PATTERN_RULES)
+        return self.patterns
+
+    def update(self, bar):
+        """
+        Adds one bar (a mapping or Series with a 'Close' entry, or a close price).
+        Returns the current pattern dictionary.
+        """
+        close = float(bar) if isinstance(bar, (int, float, np.number)) else float(bar['Close'])
+        self._closes.append(close)
+        self.bar_count += 1
+
+        # The bar `window` bars back now has all of its right-hand neighbours
+        candidate = self.bar_count - 1 - self.window
+        if candidate <= 0:
+            return self.patterns
+        closes = list(self._closes)
+        pos = len(closes) - 1 - self.window
+        value = closes[pos]
+        left = closes[:pos]
+        right = closes[pos + 1:]
+
+        new_kinds = set()
+        if value > max(left) and value > max(right):
+            self._maxima.append(candidate)
+            self._max_close.append(value)
+            new_kinds.add("max")
+        elif value < min(left) and value < min(right):
+            self._minima.append(candidate)
+            self._min_close.append(value)
+            new_kinds.add("min")
+
+        if new_kinds:
+            self._evaluate([name for name, kinds in PATTERN_PIVOTS.items() if new_kinds.intersection(kinds)])
+        return self.patterns
+
+    def _evaluate(self, names):
+        maxima = np.array(self._maxima, dtype=np.int64)
+        minima = np.array(self._minima, dtype=np.int64)
+        max_close = np.array(self._max_close)
+        min_close = np.array(self._min_close)
+        for name in names:
+            match = PATTERN_RULES[name](maxima, minima, max_close, min_close, self.sensitivity)
+            self.patterns[name]["detected"] = match is not None
+            self.patterns[name]["points"] = match[0] if match is not None else []
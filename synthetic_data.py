@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# Pattern shapes as (position, relative price offset) knots over the pattern width.
+# Planted patterns should be several times wider than the detector window; a
+# pattern planted so it ends on the last bar is what detect_patterns reports.
+PATTERN_TEMPLATES = {
+    "Double Top": [(0, 0.0), (0.25, 0.10), (0.5, 0.03), (0.75, 0.10), (1, 0.0)],
+    "Double Bottom": [(0, 0.0), (0.25, -0.10), (0.5, -0.03), (0.75, -0.10), (1, 0.0)],
+    "Head and Shoulders": [(0, 0.0), (1 / 6, 0.06), (2 / 6, 0.02), (3 / 6, 0.10), (4 / 6, 0.02), (5 / 6, 0.06), (1, 0.0)],
+    "Flag": [(0, 0.0), (0.5, 0.15), (0.6, 0.14), (0.7, 0.15), (0.8, 0.14), (0.9, 0.15), (1, 0.13)],
+    "Pennant": [(0, 0.0), (0.3, 0.15), (0.45, 0.05), (0.6, 0.14), (0.75, 0.12), (0.9, 0.135), (1, 0.115)],
+    "Triangle": [(0, 0.0), (0.125, 0.05), (0.25, -0.05), (0.375, 0.049), (0.5, -0.049),
+                 (0.625, 0.048), (0.75, -0.048), (0.875, 0.047), (1, 0.0)],
+    "Cup and Handle": [(0, 0.10), (0.1, 0.06), (0.15, 0.07), (0.35, 0.0), (0.55, 0.06), (0.6, 0.05), (0.7, 0.10),
+                       (0.8, 0.07), (0.9, 0.12), (1, 0.11)]
+}
+
+def _ohlc_from_close(close, rng, spread=0.001):
+    """Builds Open/High/Low/Volume columns around a close path."""
+    open_ = np.empty_like(close)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, spread, (2, len(close))))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(10, 0.5, len(close)).round()
+    return open_, high, low, volume
+
+def generate_ohlcv(n_bars, seed=0, start="2020-01-01", freq="1min", start_price=100.0, volatility=0.002,
+                   patterns=None):
+    """
+    Generates a reproducible random-walk OHLCV DataFrame.
+    patterns is an optional list of (pattern name, start bar, width) to plant
+    using PATTERN_TEMPLATES; the rest of the series is shifted to stay continuous.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, n_bars)))
+    for name, at, width in patterns or []:
+        close = plant_pattern(close, name, at, width, rng, volatility / 4)
+    open_, high, low, volume = _ohlc_from_close(close, rng)
+    index = pd.date_range(start=start, periods=n_bars, freq=freq)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+def plant_pattern(close, name, at, width, rng=None, noise=0.0005):
+    """
+    Overwrites close[at:at + width] with a pattern template anchored at close[at].
+    Returns a new close array.
+    """
+    rng = rng if rng is not None else np.random.default_rng(0)
+    knots = np.array(PATTERN_TEMPLATES[name])
+    end = min(at + width, len(close))
+    positions = np.linspace(0, 1, end - at)
+    shape = np.interp(positions, knots[:, 0], knots[:, 1]) + rng.normal(0, noise, end - at)
+
+    close = close.copy()
+    base = close[at]
+    old_end = close[end - 1]
+    close[at:end] = base * (1 + shape)
+    # Keep the walk continuous after the planted segment
+    close[end:] *= close[end - 1] / old_end
+    return close
+
+def generate_universe(n_symbols, n_bars, seed=0, freq="1d", start="2015-01-01"):
+    """
+    Generates OHLCV data for many symbols.
+    Returns a dict mapping symbol names (SYM0000, ...) to DataFrames.
+    """
+    return {f"SYM{i:04d}": generate_ohlcv(n_bars, seed=seed + i, start=start, freq=freq)
+            for i in range(n_symbols)}
+
+def to_alpha_vantage_json(df, interval="5min"):
+    """
+    Converts an OHLCV DataFrame into an Alpha Vantage style response dict
+    (newest bar first), for exercising the response parser.
+    """
+    daily = interval == "daily"
+    key = "Time Series (Daily)" if daily else f"Time Series ({interval})"
+    fmt = "%Y-%m-%d" if daily else "%Y-%m-%d %H:%M:%S"
+    timestamps = df.index.strftime(fmt)[::-1]
+    values = df[["Open", "High", "Low", "Close"]].to_numpy()[::-1]
+    volumes = df["Volume"].to_numpy()[::-1]
+    series = {
+        ts: {"1. open": f"{o:.4f}", "2. high": f"{h:.4f}", "3. low": f"{l:.4f}", "4. close": f"{c:.4f}",
+             "5. volume": f"{int(v)}"}
+        for ts, (o, h, l, c), v in zip(timestamps, values, volumes)
+    }
+    return {"Meta Data": {"1. Information": "Synthetic data"}, key: series}
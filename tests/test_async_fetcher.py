@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+from async_fetcher import TokenBucket, fetch_many
+from synthetic_data import generate_ohlcv, to_alpha_vantage_json
+
+THROTTLE_NOTE = {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute."}
+
+@pytest.fixture
+def stub_server():
+    """
+    Local Alpha Vantage stand-in. Symbols select the response: DOWN answers
+    HTTP 500, UNKNOWN an error message, THROTTLED one quota note before its
+    data, anything else 50 recent 5-minute bars.
+    Yields (url, requests as (symbol, monotonic time), served bars).
+    """
+    seen = []
+    throttles_left = {"THROTTLED": 1}
+    bars = generate_ohlcv(50, seed=1, freq="5min",
+                          start=pd.Timestamp.now().floor("5min") - pd.Timedelta(minutes=5 * 49))
+    bars_body = json.dumps(to_alpha_vantage_json(bars, interval="5min")).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            symbol = parse_qs(urlparse(self.path).query)["symbol"][0]
+            seen.append((symbol, time.monotonic()))
+            if symbol == "DOWN":
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if symbol == "UNKNOWN":
+                body = json.dumps({"Error Message": "Invalid API call."}).encode()
+            elif throttles_left.get(symbol):
+                throttles_left[symbol] -= 1
+                body = json.dumps(THROTTLE_NOTE).encode()
+            else:
+                body = bars_body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/query", seen, bars
+    server.shutdown()
+    server.server_close()
+
+def test_token_bucket_waits_once_capacity_is_spent():
+    async def run():
+        bucket = TokenBucket(rate=2, per=0.2)
+        start = time.monotonic()
+        waits = [await bucket.acquire() for _ in range(4)]
+        return waits, time.monotonic() - start
+
+    waits, elapsed = asyncio.run(run())
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+    assert elapsed >= 0.18
+
+def test_fetch_many_returns_df_or_error_per_symbol(stub_server):
+    url, seen, bars = stub_server
+    progress = []
+    results = fetch_many(["AAPL", "UNKNOWN", "DOWN"], "5d", "5m", "key", calls_per_minute=600,
+                         retries=2, base_url=url, backoff_base=0.01,
+                         progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+    df, error, seconds = results["AAPL"]
+    assert error is None and seconds > 0
+    assert len(df) == len(bars)
+    assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+    assert df.index.is_monotonic_increasing
+
+    df, error, _ = results["UNKNOWN"]
+    assert df.empty and "Alpha Vantage error" in error
+
+    df, error, _ = results["DOWN"]
+    assert df.empty and "after 2 attempts" in error
+    assert sum(symbol == "DOWN" for symbol, _ in seen) == 2
+
+def test_throttle_note_drains_bucket_and_retries(stub_server):
+    url, seen, bars = stub_server
+    # 600 calls per minute refills one token every 0.1 s once the bucket is drained
+    results = fetch_many(["THROTTLED"], "5d", "5m", "key", calls_per_minute=600,
+                         retries=3, base_url=url, backoff_base=0.01)
+
+    df, error, seconds = results["THROTTLED"]
+    assert error is None and len(df) == len(bars)
+    assert seconds >= 0.09
+    times = [t for symbol, t in seen if symbol == "THROTTLED"]
+    assert len(times) == 2
+    assert times[1] - times[0] >= 0.09